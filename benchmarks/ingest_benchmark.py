@@ -0,0 +1,140 @@
+"""Compare response.json() + json_normalize against the dashboard's ingest path.
+
+Measures 1, 6 and 12 month windows, each run in a fresh subprocess so peak RSS is
+measured per run:
+
+  json_normalize  the whole payload parsed at once and flattened, as the dashboard
+                  did before the history store
+  cold load       load_history against a local stand-in for the API (replaying
+                  pre-rendered responses): fetch_chunk cuts
+                  each row down to the referenced columns as it is parsed, the
+                  compact rows are stored as JSON in SQLite, then read_frame
+                  extracts the columns
+  warm load       load_history again once the store holds the window (read_frame only)
+
+    python benchmarks/ingest_benchmark.py
+"""
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MONTHS = [1, 6, 12]
+START = datetime(2024, 1, 1)
+PORT = 8798
+ASSETS = ['SOL', 'ETH', 'BONK']
+ASGARD_BORROW_ASSETS = ['USDC', 'USDT', 'ETH']
+# Tokens the API reports that the fee calculations never read
+EXTRA_TOKENS = ['btc', 'jup', 'jto', 'wif', 'pyth', 'ray', 'msol', 'jitosol']
+
+def synthetic_row(ts):
+    hour = ts.timestamp() / 3600
+    tokens = [asset.lower() for asset in ASSETS] + ['usdc', 'usdt'] + EXTRA_TOKENS
+    row = {'createdAt': ts.strftime('%Y-%m-%dT%H:%M:%S.000Z'), 'drift': {}, 'flashPerp': {}, 'jupPerp': {}}
+    for asset in ASSETS + [token.upper() for token in EXTRA_TOKENS]:
+        row['drift'][f'{asset}Perp'] = {'driftHourlyFunding': 0.001 * math.sin(hour / 7), 'openInterest': 1e6, 'markPrice': 100.0}
+    for venue in ['flashPerp', 'jupPerp']:
+        for token in tokens:
+            row[venue][f'{token}Token'] = {'HourlyBorrowRate': 0.002 * math.cos(hour / 5), 'utilization': 0.5,
+                                           'currentLTV': 0.7, 'currentBorrowed': 1e5, 'annualRate': 17.5}
+    for venue in ['marginfi', 'kamino']:
+        row[venue] = {f'{token}Token': {'depositIRate': 0.05, 'borrowIRate': 0.09 + 0.02 * math.cos(hour / 13),
+                                        'totalDeposits': 1e7, 'totalBorrows': 5e6, 'utilization': 0.5}
+                      for token in tokens}
+    return row
+
+def window(months):
+    end = START + timedelta(days=months * 30 - 1)
+    return START.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+def write_payload(path, months):
+    hours = months * 30 * 24
+    with open(path, 'w') as fp:
+        fp.write('[')
+        for i in range(hours):
+            if i:
+                fp.write(',')
+            json.dump(synthetic_row(START + timedelta(hours=i)), fp)
+        fp.write(']')
+
+def run_one(method, months, path):
+    import pandas as pd
+    from fee_engine import required_columns
+    from fetcher import fetch_chunks
+    from history_store import load_history
+    from instrumentation import PipelineMetrics
+
+    metrics = PipelineMetrics()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if method == 'json_normalize':
+        with open(path, 'rb') as fp:
+            df = pd.json_normalize(json.load(fp))
+    else:
+        start_date, end_date = window(months)
+        columns = required_columns(ASSETS, ASGARD_BORROW_ASSETS)
+        df = load_history(start_date, end_date,
+                          lambda ranges: fetch_chunks(f'http://127.0.0.1:{PORT}/fee-comparisons', ranges, metrics=metrics, columns=columns),
+                          columns, path, metrics)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'peak_rss_kb': peak_rss, 'delta_rss_kb': peak_rss - baseline_rss,
+                      'rows': len(df), 'columns': len(df.columns),
+                      'stages': {name: stage['seconds'] for name, stage in metrics.stages().items()}}))
+
+def wait_for_server():
+    for _ in range(50):
+        try:
+            urlopen(f'http://127.0.0.1:{PORT}/stats').close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+def prerender(months):
+    """Have the stand-in render every chunk of the window once, so cold loads time the client only."""
+    from fetcher import fetch_chunks
+
+    for _ in fetch_chunks(f'http://127.0.0.1:{PORT}/fee-comparisons', [window(months)], columns=[]):
+        pass
+
+def main():
+    # Stages overlap across fetch workers; read_frame's share of a load is 'Build frame'
+    print(f"{'window':>8} {'method':>15} {'rows':>6} {'cols':>5} {'wall (s)':>9} {'store (s)':>10} {'read_frame (s)':>15} "
+          f"{'peak RSS (MB)':>14} {'load RSS (MB)':>14} {'store (MB)':>11}")
+    server = subprocess.Popen([sys.executable, __file__, '--serve'])
+    try:
+        wait_for_server()
+        with tempfile.TemporaryDirectory() as tmp:
+            for months in MONTHS:
+                payload = os.path.join(tmp, f'{months}m.json')
+                db_path = os.path.join(tmp, f'{months}m.sqlite3')
+                write_payload(payload, months)
+                prerender(months)
+                for method, path in [('json_normalize', payload), ('cold load', db_path), ('warm load', db_path)]:
+                    output = subprocess.run([sys.executable, __file__, '--run', method, str(months), path],
+                                            check=True, capture_output=True, text=True).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    stages = result['stages']
+                    store_mb = os.path.getsize(db_path) / 2 ** 20 if method != 'json_normalize' else float('nan')
+                    print(f"{months:>7}m {method:>15} {result['rows']:>6} {result['columns']:>5} {result['seconds']:>9.3f} "
+                          f"{stages.get('Store snapshots', float('nan')):>10.3f} {stages.get('Build frame', float('nan')):>15.3f} "
+                          f"{result['peak_rss_kb'] / 1024:>14.1f} {result['delta_rss_kb'] / 1024:>14.1f} {store_mb:>11.1f}")
+    finally:
+        server.terminate()
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == '--run':
+        run_one(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    elif sys.argv[1:] == ['--serve']:
+        from sessions_benchmark import serve
+        serve(PORT, 0, cache=True)
+    else:
+        main()
@@ -0,0 +1,145 @@
+"""Latency of 1 to 50 concurrent dashboard sessions, with and without the shared service.
+
+Starts a local stand-in for the fee-comparison API (with injected latency) in a
+subprocess, then opens N simulated sessions at once on a cold start:
+
+  per-session  every session fetches the window and computes its own fee grid,
+               as the dashboard did before the aggregation service
+  shared       every session asks one AggregationService for the window
+
+    python benchmarks/sessions_benchmark.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SESSIONS = [1, 5, 10, 25, 50]
+WINDOW_DAYS = 30
+UPSTREAM_LATENCY = 0.2
+PORT = 8799
+
+def serve(port, latency, cache=False):
+    """Serve synthetic snapshots; with `cache`, each body is rendered once and then replayed."""
+    from ingest_benchmark import synthetic_row
+
+    requests_served = [0]
+    bodies = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/stats':
+                body = json.dumps({'requests': requests_served[0]}).encode()
+            else:
+                with lock:
+                    requests_served[0] += 1
+                time.sleep(latency)
+                query = parse_qs(url.query)
+                body = bodies.get(url.query)
+                if body is None:
+                    day = datetime.strptime(query['from'][0], '%Y-%m-%d')
+                    end = datetime.strptime(query['to'][0], '%Y-%m-%d') + timedelta(days=1)
+                    rows = []
+                    while day < end:
+                        rows.append(synthetic_row(day))
+                        day += timedelta(hours=1)
+                    body = json.dumps(rows).encode()
+                    if cache:
+                        bodies[url.query] = body
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+def upstream_requests(base_url):
+    with urlopen(f'{base_url}/stats') as response:
+        return json.load(response)['requests']
+
+def run_sessions(n_sessions, session):
+    latencies = [None] * n_sessions
+    barrier = threading.Barrier(n_sessions)
+
+    def run(i):
+        barrier.wait()
+        started = time.perf_counter()
+        session(i)
+        latencies[i] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n_sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies)
+
+def main():
+    from fee_engine import (
+        ASGARD_BORROW_ASSETS, ASSETS, LEVERAGE_OPTIONS, compute_fee_grid, get_displayed_exchanges, required_columns,
+        scale_fee_grid, select_configuration,
+    )
+    from fetcher import fetch_chunks, fetch_range
+    from ingest import snapshots_to_frame
+    from shared_service import AggregationService
+
+    server = subprocess.Popen([sys.executable, __file__, '--serve'])
+    base_url = f'http://127.0.0.1:{PORT}'
+    api_url = f'{base_url}/fee-comparisons'
+    end = datetime(2024, 6, 30)
+    start_date, end_date = (end - timedelta(days=WINDOW_DAYS - 1)).strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    columns = required_columns(ASSETS, ASGARD_BORROW_ASSETS)
+    try:
+        for _ in range(50):
+            try:
+                upstream_requests(base_url)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        def per_session(i):
+            rows, _ = fetch_range(api_url, start_date, end_date)
+            df = snapshots_to_frame(rows, columns)
+            grid = compute_fee_grid(df, 10000.0, 0.0006, 0.0006, ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges)
+            select_configuration(grid, ASSETS[i % len(ASSETS)], LEVERAGE_OPTIONS[i % len(LEVERAGE_OPTIONS)], 'USDC')
+
+        print(f"{'sessions':>8} {'mode':>12} {'p50 (s)':>8} {'p95 (s)':>8} {'max (s)':>8} {'upstream requests':>18}")
+        for n_sessions in SESSIONS:
+            with tempfile.TemporaryDirectory() as tmp:
+                service = AggregationService(db_path=os.path.join(tmp, 'history.sqlite3'))
+
+                def shared(i):
+                    window = service.get_window(start_date, end_date, lambda ranges: fetch_chunks(api_url, ranges))
+                    select_configuration(scale_fee_grid(window.unit_fee_grid, 10000.0),
+                                         ASSETS[i % len(ASSETS)], LEVERAGE_OPTIONS[i % len(LEVERAGE_OPTIONS)], 'USDC')
+
+                for mode, session in [('per-session', per_session), ('shared', shared)]:
+                    before = upstream_requests(base_url)
+                    latencies = run_sessions(n_sessions, session)
+                    print(f"{n_sessions:>8} {mode:>12} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+                          f"{latencies.max():>8.2f} {upstream_requests(base_url) - before:>18}")
+    finally:
+        server.terminate()
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--serve']:
+        serve(PORT, UPSTREAM_LATENCY)
+    else:
+        main()
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Upstream publishes one snapshot per hour, so entries older than this may be stale.
+CACHE_TTL_SECONDS = float(os.environ.get('FEE_CACHE_TTL', 15 * 60))
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Module-level instances live for the whole Streamlit server process, so they are
+    shared by every rerun and every session.
+    """
+
+    def __init__(self, name, maxsize, ttl=CACHE_TTL_SECONDS):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, calling `compute()` and storing its result on a miss.
+
+        None results are not cached so failed computations are retried.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'Layer': self.name,
+                'Entries': len(self._entries),
+                'Hits': self.hits,
+                'Misses': self.misses,
+                'Evictions': self.evictions,
+                'Hit Rate': self.hits / lookups if lookups else 0.0,
+            }
+
+fee_cache = TTLCache('Fee results', maxsize=256)
+CACHES = [fee_cache]
+
+def frame_digest(df):
+    """Content hash of a rate history frame, used to key everything derived from it."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes() + ','.join(df.columns).encode(), digest_size=16).hexdigest()
+
+def cached_fees(key, compute):
+    """Return fee results for `key`, which must include the payload digest."""
+    return fee_cache.get_or_compute(key, compute)
+
+def cache_stats():
+    return pd.DataFrame([cache.stats() for cache in CACHES]).set_index('Layer')
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from fee_engine import ASGARD_BORROW_ASSETS, ASSETS
+from shared_service import (
+    DEFAULT_ASGARD_FEE, DEFAULT_CAPITAL, DEFAULT_LEVERAGE, METADATA_URL, cached_hourly_fees, cached_venue_fees,
+    get_service, window_dates, window_key,
+)
+
+# The dashboard windows most sessions open with, most popular first
+STANDARD_WINDOWS = [(1, 'Days'), (7, 'Days'), (1, 'Months'), (3, 'Months'), (6, 'Months'), (12, 'Months')]
+WARM_MEMORY_BUDGET = int(float(os.environ.get('FEE_WARM_MEMORY_MB', 512)) * 2 ** 20)
+SNAPSHOT_INTERVAL = timedelta(hours=1)
+SNAPSHOT_SETTLE_SECONDS = 120
+# Below the fee cache TTL, so the per-asset results stay warm between snapshots
+REWARM_SECONDS = 10 * 60
+RETRY_SECONDS = 60
+
+def snapshot_nbytes(window):
+    """Approximate memory held by a WindowSnapshot."""
+    index = window.rate_index
+    return int(window.df.memory_usage(deep=True).sum() + window.unit_fee_grid.memory_usage(deep=True).sum()
+               + window.schedules.matrix.nbytes
+               + sum(array.nbytes for array in vars(index).values() if hasattr(array, 'nbytes')))
+
+def window_hours(start_date, end_date):
+    """Hours of data in the inclusive day range start_date..end_date."""
+    days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+    return days * 24
+
+class CacheWarmer:
+    """Keeps the standard dashboard windows and main.py's metadata loaded before anyone asks.
+
+    Every cycle loads each standard window through the AggregationService and precomputes
+    the default-configuration fees of every asset into the shared fee cache, within
+    `memory_budget` bytes of window data. A window is only loaded when its size, estimated
+    from the bytes per hour of the longest window loaded so far, fits in what is left; windows
+    past the budget are evicted if the warmer holds them and are otherwise left to load
+    on demand. The warmed windows are managed by the warmer: the service's refresh loop
+    skips them, and cycles reload them shortly after each hourly snapshot is due upstream
+    so new snapshots show up at once. Cycles run every `rewarm_seconds` in between.
+    """
+
+    def __init__(self, service, windows=STANDARD_WINDOWS, assets=ASSETS, memory_budget=WARM_MEMORY_BUDGET,
+                 settle_seconds=SNAPSHOT_SETTLE_SECONDS, rewarm_seconds=REWARM_SECONDS):
+        self.service = service
+        self.windows = list(windows)
+        self.assets = list(assets)
+        self.memory_budget = memory_budget
+        self.settle_seconds = settle_seconds
+        self.rewarm_seconds = rewarm_seconds
+        self.counters = {'Cycles': 0, 'Failures': 0, 'Windows': 0, 'Skipped (budget)': 0, 'Bytes': 0}
+        self.latest_snapshot = None
+        self._snapshot_due = None
+        self._warmed = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def warm(self, now=None):
+        """Run one warming cycle; returns the newest createdAt among the warmed windows."""
+        now = now or datetime.now()
+        keys = []
+        for time_value, time_unit in self.windows:
+            start_date, end_date = window_dates(time_value, time_unit, now)
+            keys.append(window_key(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+        if self._snapshot_due is not None and now >= self._snapshot_due:
+            self.service.refresh([key for key in keys if key in self._warmed])
+
+        warmed, used, skipped, latest = set(), 0, 0, None
+        bytes_per_hour, sampled_hours = 0.0, 0
+        for key in keys:
+            _, start_date, end_date = key
+            hours = window_hours(start_date, end_date)
+            if used + bytes_per_hour * hours > self.memory_budget:
+                skipped += 1
+                if key in self._warmed:
+                    self.service.evict(key)
+                continue
+            held = self.service.peek(key) is not None
+            window = self.service.get_window(start_date, end_date)
+            if window is None:
+                continue
+            nbytes = snapshot_nbytes(window)
+            if hours > sampled_hours:  # Fixed overheads weigh least in the longest window
+                bytes_per_hour, sampled_hours = nbytes / hours, hours
+            if used + nbytes > self.memory_budget:
+                skipped += 1
+                if key in self._warmed or not held:
+                    self.service.evict(key)
+                continue
+            warmed.add(key)
+            used += nbytes
+            latest = max(latest or '', window.df['createdAt'].iloc[-1])
+            for asset in self.assets:
+                fee_args = (window, asset, DEFAULT_LEVERAGE, ASGARD_BORROW_ASSETS[0], DEFAULT_ASGARD_FEE, DEFAULT_ASGARD_FEE, DEFAULT_CAPITAL)
+                cached_venue_fees(*fee_args)
+                cached_hourly_fees(*fee_args)
+        self.service.get_metadata(METADATA_URL)
+        for key in self._warmed - set(keys):
+            self.service.evict(key)  # Yesterday's windows, after the dates rolled over
+        self.service.manage(warmed)
+        self._warmed = warmed
+
+        with self._lock:
+            self.counters['Cycles'] += 1
+            self.counters.update({'Windows': len(warmed), 'Skipped (budget)': skipped, 'Bytes': used})
+            self.latest_snapshot = latest
+        if latest is not None:
+            # createdAt is UTC; the schedule runs on local time like window_dates
+            newest = datetime.strptime(latest[:19], '%Y-%m-%dT%H:%M:%S') + (now - datetime.now(timezone.utc).replace(tzinfo=None))
+            self._snapshot_due = newest + SNAPSHOT_INTERVAL + timedelta(seconds=self.settle_seconds)
+        return latest
+
+    def seconds_until_next(self, now=None):
+        """Sleep until the next snapshot is due (plus settle time), at most rewarm_seconds."""
+        if self._snapshot_due is None:
+            return RETRY_SECONDS
+        until_due = (self._snapshot_due - (now or datetime.now())).total_seconds()
+        if until_due <= 0:
+            return RETRY_SECONDS  # Overdue upstream; check again soon
+        return min(until_due, self.rewarm_seconds)
+
+    def start(self):
+        """Start the background warming thread once."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.warm()
+            except Exception:
+                with self._lock:
+                    self.counters['Failures'] += 1  # Upstream down; the next cycle retries
+            time.sleep(self.seconds_until_next())
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, **{'Latest snapshot': self.latest_snapshot})
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+def get_warmer():
+    """Return the process-wide CacheWarmer, starting it on first use."""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer(get_service())
+            _warmer.start()
+        return _warmer
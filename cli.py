@@ -0,0 +1,33 @@
+"""Scaffolding shared by the command-line tools (report.py, history_export.py)."""
+import sys
+import time
+
+from fee_engine import ASGARD_BORROW_ASSETS, ASSETS, required_columns
+from fetcher import API_URL, fetch_chunks
+from history_store import HISTORY_DB_PATH, load_history
+
+def log(message):
+    print(message, file=sys.stderr)
+
+def _progress(done, total):
+    if done == total or done % 10 == 0:
+        log(f"Fetched {done}/{total} chunks")
+
+def _fetch_ranges(ranges):
+    for chunk_start, chunk_end, rows in fetch_chunks(API_URL, ranges, progress=_progress, columns=required_columns(ASSETS, ASGARD_BORROW_ASSETS)):
+        if rows is None:
+            log(f"Failed to fetch {chunk_start} to {chunk_end}")
+        yield chunk_start, chunk_end, rows
+
+def load_cli_history(start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Load days start_date..end_date through the history store, logging progress to stderr.
+
+    Returns the frame of every required column, or None when the range has no data.
+    """
+    started = time.perf_counter()
+    df = load_history(start_date, end_date, _fetch_ranges, required_columns(ASSETS, ASGARD_BORROW_ASSETS), db_path)
+    log(f"Loaded {len(df)} hourly rows in {time.perf_counter() - started:.2f}s")
+    if df.empty:
+        log("No data available for the requested range")
+        return None
+    return df
@@ -1,287 +1,171 @@
+import os
+
 import streamlit as st
-import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from datetime import timedelta
+
+from cache import cache_stats, cached_fees
+from cache_warmer import get_warmer
+from downsample import METHODS as DOWNSAMPLING_METHODS, downsample
+from fee_engine import (
+    ASGARD_BORROW_ASSETS, ASSETS, EXCHANGE_NAMES, FEE_SCHEDULES, HOURS_PER_YEAR, LEVERAGE_OPTIONS, best_venues,
+    compounded_fees, compute_fee_grid, get_displayed_exchanges, hourly_rate_matrix,
+    rate_columns, required_columns, scale_fee_grid, select_configuration,
+)
+from fetcher import API_URL, fetch_chunks
+from history_export import EXPORT_DIR, FORMATS as EXPORT_FORMATS, arrow_available, export_window, open_export
+from instrumentation import PipelineMetrics, export_run, profile_dump, profile_report, start_profiler
+from live_tail import LiveWindow, venue_rate_matrix
+from multi_asset import compare_assets
+from prefix_index import rate_terms
+from projection import BLOCK_HOURS, PROJECTION_PATHS, project_fees
+from rolling_stats import ROLLING_WINDOWS, RollingRateStats
+from shared_service import (
+    DEFAULT_ASGARD_FEE, DEFAULT_CAPITAL, DEFAULT_LEVERAGE, cached_hourly_fees, cached_venue_fees, get_service, window_dates,
+)
+from switching import backtest_grid, schedule_segments
 
 # Constants
-ASSETS = ['SOL', 'ETH', 'BONK']
-LEVERAGE_OPTIONS = [1.5, 2.0, 3.0, 4.0, 5.0]
-ASGARD_BORROW_ASSETS = ['USDC', 'USDT', 'ETH']
-API_URL = "http://159.223.14.10:6969/fee-comparisons"
-
-def get_displayed_exchanges(borrow_asset):
-    if borrow_asset in ['USDC', 'USDT']:
-        return ['drift', 'flash', 'jup', 'marginfi', 'kamino']
-    else:
-        return ['marginfi', 'kamino']
-
-def fetch_data(start_date, end_date):
-    """Fetch data from API."""
-    response = requests.get(f"{API_URL}?from={start_date}&to={end_date}")
-    if response.status_code == 200:
-        return response.json()
-    st.error(f"Failed to fetch data: {response.status_code}")
-    return None
-
-def calculate_exchange_fees(df, exchange, asset, position_size, leverage, asgard_borrow_asset, asgard_open_fee, asgard_close_fee):
-    open_fee = close_fee = variable_fees = total_fees = 0
-    rates = pd.Series([0] * len(df))
-    data_available = True
-    discount = None
-
-    if exchange == 'drift':
-        funding_column = f'drift.{asset}Perp.driftHourlyFunding'
-        if funding_column in df.columns:
-            rates = df[funding_column]
-            base_fee_rate = 0.001
-            
-            if asset in ['SOL', 'ETH', 'BTC']:
-                discounted_fee_rate = base_fee_rate * 0.25  # 75% discount
-                open_fee = discounted_fee_rate * position_size
-                close_fee = open_fee
-                discount = '75%'
-            else:
-                open_fee = base_fee_rate * position_size
-                close_fee = open_fee
-            
-            variable_fees = rates.sum() / 100 * position_size
-            total_fees = open_fee + close_fee + variable_fees
-        else:
-            data_available = False
-            st.warning(f"Could not find funding rate data for {asset} in Drift. Using 0 for calculations.")
-    elif exchange == 'flash':
-        borrow_column = f'flashPerp.{asset.lower()}Token.HourlyBorrowRate'
-        if borrow_column in df.columns:
-            rates = df[borrow_column]
-            open_fee = (0.0015 if asset == 'BONK' else 0.0008) * position_size
-            close_fee = open_fee
-            variable_fees = rates.sum() / 100 * position_size
-            total_fees = open_fee + close_fee + variable_fees
-        else:
-            data_available = False
-            st.warning(f"Could not find borrow rate data for {asset} in Flash Trade. Using 0 for calculations.")
-    elif exchange == 'jup':
-        borrow_column = f'jupPerp.{asset.lower()}Token.HourlyBorrowRate'
-        if borrow_column in df.columns:
-            rates = df[borrow_column]
-            open_fee = 0.0006 * position_size
-            close_fee = 0.0006 * position_size
-            variable_fees = rates.sum() / 100 * position_size
-            total_fees = open_fee + close_fee + variable_fees
-        else:
-            data_available = False
-            st.warning(f"Could not find borrow rate data for {asset} in Jup Perps. Using 0 for calculations.")
-    elif exchange in ['marginfi', 'kamino']:  # Asgard (MarginFi or Kamino)
-        deposit_column = f'{exchange}.{asset.lower()}Token.depositIRate'
-        borrow_column = f'{exchange}.{asgard_borrow_asset.lower()}Token.borrowIRate'
-        if deposit_column in df.columns and borrow_column in df.columns:
-            deposit_rates = df[deposit_column] / (365 * 24) * 100
-            borrow_rates = df[borrow_column] / (365 * 24) * 100
-            rates = borrow_rates - (borrow_rates / leverage) - deposit_rates
-            # Apply 75% discount for SOL, BTC, and ETH
-            if asset in ['SOL', 'ETH', 'BTC']:
-                open_fee = asgard_open_fee * position_size * 0.25  # 75% discount
-                close_fee = asgard_close_fee * position_size * 0.25  # 75% discount
-                discount = '75%'
-            else:
-                open_fee = asgard_open_fee * position_size
-                close_fee = asgard_close_fee * position_size
-            variable_fees = rates.sum() / 100 * position_size
-            total_fees = open_fee + close_fee + variable_fees
-        else:
-            data_available = False
-            st.warning(f"Could not find rate data for Asgard ({exchange.capitalize()}). Using 0 for calculations.")
-    
-    return open_fee, variable_fees, close_fee, total_fees, rates, data_available, discount
-
-def calculate_hourly_variable_fees(df, exchange, asset, position_size, leverage, asgard_borrow_asset):
-    if exchange == 'drift':
-        funding_column = f'drift.{asset}Perp.driftHourlyFunding'
-        if funding_column in df.columns:
-            return df[funding_column] / 100 * position_size
-    elif exchange == 'flash':
-        borrow_column = f'flashPerp.{asset.lower()}Token.HourlyBorrowRate'
-        if borrow_column in df.columns:
-            return df[borrow_column] / 100 * position_size
-    elif exchange == 'jup':
-        borrow_column = f'jupPerp.{asset.lower()}Token.HourlyBorrowRate'
-        if borrow_column in df.columns:
-            return df[borrow_column] / 100 * position_size
-    elif exchange in ['marginfi', 'kamino']:
-        deposit_column = f'{exchange}.{asset.lower()}Token.depositIRate'
-        borrow_column = f'{exchange}.{asgard_borrow_asset.lower()}Token.borrowIRate'
-        if deposit_column in df.columns and borrow_column in df.columns:
-            deposit_rates = df[deposit_column] / (365 * 24) * 100
-            borrow_rates = df[borrow_column] / (365 * 24) * 100
-            rates = borrow_rates - (borrow_rates / leverage) - deposit_rates
-            return rates / 100 * position_size
-    return pd.Series([0] * len(df))  # Return a series of zeros if data is not available
-
-def debug_drift_calculations(df, asset, position_size):
-    st.subheader(f"Debug: Drift Calculations for {asset}")
-    
-    funding_column = f'drift.{asset}Perp.driftHourlyFunding'
+DEBUG_PAGE_SIZE = 100
+LIVE_POLL_SECONDS = 60
+
+# Wall time, rows and bytes of every stage of this run, and an opt-in profile of the whole rerun
+pipeline = PipelineMetrics()
+if st.session_state.get('active_profiler') is not None:
+    st.session_state['active_profiler'].disable()  # Left running by an interrupted rerun
+st.session_state['active_profiler'] = start_profiler() if st.session_state.get('profile_reruns') else None
+
+def missing_data_warning(exchange, asset):
+    """Warning for a venue without rate data, worded from its fee schedule."""
+    schedule = FEE_SCHEDULES[exchange]
+    if schedule.levered_borrow:
+        return f"Could not find rate data for {schedule.name}. Using 0 for calculations."
+    return f"Could not find {schedule.rate_label.lower()} rate data for {asset} in {schedule.name}. Using 0 for calculations."
+
+def chart_points(data):
+    """`data` downsampled to the point budget, unless full resolution is requested."""
+    if st.session_state.get('full_resolution_charts', False):
+        return data
+    return downsample(data, method=st.session_state.get('chart_downsampling', DOWNSAMPLING_METHODS[0]))
+
+def line_chart(data, name):
+    """Draw a line chart, downsampled to the point budget unless full resolution is requested.
+
+    Only the drawn points are reduced; callers compute totals and statistics from `data` itself.
+    """
+    with pipeline.stage(f"Chart: {name}", rows=len(data)):
+        st.line_chart(chart_points(data))
+
+def fetch_data(ranges):
+    """Fetch missing day ranges from API in parallel chunks, showing progress as chunks arrive."""
+    progress_bar = st.progress(0.0, text="Fetching data...")
+
+    def report(done, total):
+        progress_bar.progress(done / total, text=f"Fetched {done} of {total} chunks")
+
+    columns = required_columns(ASSETS, ASGARD_BORROW_ASSETS)
+    for chunk_start, chunk_end, rows in fetch_chunks(API_URL, ranges, progress=report, metrics=pipeline, columns=columns):
+        if rows is None:
+            st.error(f"Failed to fetch data for {chunk_start} to {chunk_end}")
+        yield chunk_start, chunk_end, rows
+    progress_bar.empty()
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_tail(df, venue_terms, position_size, window_length, config):
+    """Extend the session's live window with the snapshots found since its last run.
+
+    The LiveWindow is kept in session state per `config`, so each run only appends the
+    new rows; one poll of upstream serves every live session. A fragment run redraws its
+    elements, and this Streamlit has no add_rows, so the charts are redrawn from the
+    window at the chart point budget rather than sent only the new rows.
+    """
+    st.subheader('Live Tail')
+    state = st.session_state.get('live_tail')
+    if state is None or state[0] != config:
+        live = LiveWindow([EXCHANGE_NAMES[ex] for ex in venue_terms], window_length)
+        live.append(df['createdAt'].to_numpy(), venue_rate_matrix(df, venue_terms))
+        st.session_state['live_tail'] = state = (config, live)
+    live = state[1]
+    new_rows = get_service().poll_tail(live.last_created_at)
+    if new_rows is not None and not new_rows.empty:
+        live.append(new_rows['createdAt'].to_numpy(), venue_rate_matrix(new_rows, venue_terms))
+    st.caption(f"Last snapshot: {live.last_created_at}")
+    live_rates, live_cumulative = live.frame()
+    st.line_chart(chart_points(live_rates))
+    st.line_chart(chart_points(live_cumulative / 100 * position_size))
+    st.dataframe(live.stats())
+
+def paginated_table(df, key, page_size=DEBUG_PAGE_SIZE):
+    """Show one page of a large frame; numbers are formatted by the client, not a Styler."""
+    n_pages = max(1, -(-len(df) // page_size))
+    page = st.number_input('Page', min_value=1, max_value=n_pages, value=1, step=1, key=f'{key}_page')
+    start = (page - 1) * page_size
+    end = min(start + page_size, len(df))
+    st.caption(f"Rows {start + 1}-{end} of {len(df)}")
+    st.dataframe(df.iloc[start:end], hide_index=True, column_config={
+        column: st.column_config.NumberColumn(format='%.6f') for column in df.columns if column != 'Timestamp'
+    })
+
+def debug_calculations(exchange, asset, borrow_asset, df, position_size, leverage, net_rates, hourly_fees, open_fee, close_fee, discount,
+                       compounding=False):
+    """Debug panel for any venue, laid out from its FEE_SCHEDULES entry.
+
+    With `compounding`, the hourly fees are charged on the balance carried forward, as in
+    the fee grid, so the totals match the fee comparison table.
+    """
+    schedule = FEE_SCHEDULES[exchange]
+    st.subheader(f"Debug: {schedule.name} Calculations for {asset}")
     
     st.write(f"Asset: {asset}")
+    if schedule.deposit_column:
+        st.write(f"Borrow Asset: {borrow_asset}")
     st.write(f"Position Size: ${position_size:.2f}")
+    if schedule.levered_borrow:
+        st.write(f"Leverage: {leverage}x")
     
-    if funding_column in df.columns:
-        funding_rates = df[funding_column]
-        hourly_fees = funding_rates / 100 * position_size
-        
-        st.write("Funding Rates and Fees:")
-        debug_df = pd.DataFrame({
-            'Timestamp': df['createdAt'],
-            'Hourly Funding Rate (%)': funding_rates,
-            'Hourly Fees ($)': hourly_fees
-        })
-        st.dataframe(debug_df.style.format({
-            'Hourly Funding Rate (%)': '{:.6f}',
-            'Hourly Fees ($)': '{:.6f}'
-        }))
-        
-        st.write(f"Average Hourly Funding Rate: {funding_rates.mean():.6f}%")
-        st.write(f"Average Hourly Fees: ${hourly_fees.mean():.6f}")
-        
-        base_fee_rate = 0.001  # 0.1%
-        if asset in ['SOL', 'ETH', 'BTC']:
-            fee_rate = base_fee_rate * 0.25  # 75% discount
-            st.write(f"Fee Rate (75% discounted): {fee_rate:.4f} ({fee_rate*100:.2f}%)")
-        else:
-            fee_rate = base_fee_rate
-            st.write(f"Fee Rate: {fee_rate:.4f} ({fee_rate*100:.2f}%)")
-        
-        open_fee = fee_rate * position_size
-        close_fee = open_fee
-        variable_fees = hourly_fees.sum()
-        total_fees = open_fee + close_fee + variable_fees
-        
-        st.write(f"Open Fee: ${open_fee:.6f}")
-        st.write(f"Close Fee: ${close_fee:.6f}")
-        st.write(f"Total Variable Fees: ${variable_fees:.6f}")
-        st.write(f"Total Fees: ${total_fees:.6f}")
-        
-        st.subheader("Funding Rates Over Time")
-        st.line_chart(debug_df.set_index('Timestamp')[['Hourly Funding Rate (%)']])
-        
-        st.subheader("Hourly Fees Over Time")
-        st.line_chart(debug_df.set_index('Timestamp')[['Hourly Fees ($)']])
-    else:
-        st.write(f"Required data not found in the dataframe for {asset} on Drift.")
-
-def debug_flash_calculations(df, asset, position_size):
-    st.subheader(f"Debug: Flash Trade Calculations for {asset}")
+    open_rate, close_rate = open_fee / position_size, close_fee / position_size
+    discounted = f" ({discount} discounted)" if discount else ""
+    st.write(f"Opening Fee Rate{discounted}: {open_rate:.4f} ({open_rate*100:.2f}%)")
+    st.write(f"Closing Fee Rate{discounted}: {close_rate:.4f} ({close_rate*100:.2f}%)")
     
-    borrow_column = f'flashPerp.{asset.lower()}Token.HourlyBorrowRate'
+    rate_column = f'Hourly {schedule.rate_label} Rate (%)'
+    debug_df = pd.DataFrame({'Timestamp': df['createdAt'].to_numpy()})
+    if schedule.annual_rates:
+        # APR columns are shown as yearly and hourly percentages next to the net rate
+        borrow_column, deposit_column = rate_columns(exchange, asset, borrow_asset)
+        yearly_deposit_rates = df[deposit_column].to_numpy() * 100
+        yearly_borrow_rates = df[borrow_column].to_numpy() * 100
+        debug_df['Yearly Deposit Rate (%)'] = yearly_deposit_rates
+        debug_df['Yearly Borrow Rate (%)'] = yearly_borrow_rates
+        debug_df['Hourly Deposit Rate (%)'] = yearly_deposit_rates / HOURS_PER_YEAR
+        debug_df['Hourly Borrow Rate (%)'] = yearly_borrow_rates / HOURS_PER_YEAR
+    debug_df[rate_column] = net_rates.to_numpy()
+    if compounding:
+        rates = net_rates.to_numpy(dtype=float)
+        charges = np.diff(compounded_fees(np.nan_to_num(rates), position_size), prepend=0.0)
+        hourly_fees = pd.Series(np.where(np.isnan(rates), np.nan, charges))
+    debug_df['Hourly Fees ($)'] = hourly_fees.to_numpy()
     
-    st.write(f"Asset: {asset}")
-    st.write(f"Position Size: ${position_size:.2f}")
+    st.write("Rates and Fees:")
+    paginated_table(debug_df, f'debug_{exchange}')
     
-    if borrow_column in df.columns:
-        borrow_rates = df[borrow_column]
-        hourly_fees = borrow_rates / 100 * position_size
-        
-        st.write("Borrow Rates and Fees:")
-        debug_df = pd.DataFrame({
-            'Timestamp': df['createdAt'],
-            'Hourly Borrow Rate (%)': borrow_rates,
-            'Hourly Fees ($)': hourly_fees
-        })
-        st.dataframe(debug_df.style.format({
-            'Hourly Borrow Rate (%)': '{:.6f}',
-            'Hourly Fees ($)': '{:.6f}'
-        }))
-        
-        st.write(f"Average Hourly Borrow Rate: {borrow_rates.mean():.6f}%")
-        st.write(f"Average Hourly Fees: ${hourly_fees.mean():.6f}")
-        
-        fee_rate = 0.0015 if asset == 'BONK' else 0.0008
-        st.write(f"Fee Rate: {fee_rate:.4f} ({fee_rate*100:.2f}%)")
-        
-        open_fee = fee_rate * position_size
-        close_fee = open_fee
-        variable_fees = hourly_fees.sum()
-        total_fees = open_fee + close_fee + variable_fees
-        
-        st.write(f"Open Fee: ${open_fee:.6f}")
-        st.write(f"Close Fee: ${close_fee:.6f}")
-        st.write(f"Total Variable Fees: ${variable_fees:.6f}")
-        st.write(f"Total Fees: ${total_fees:.6f}")
-        
-        st.subheader("Borrow Rates Over Time")
-        st.line_chart(debug_df.set_index('Timestamp')[['Hourly Borrow Rate (%)']])
-        
-        st.subheader("Hourly Fees Over Time")
-        st.line_chart(debug_df.set_index('Timestamp')[['Hourly Fees ($)']])
-    else:
-        st.write(f"Required data not found in the dataframe for {asset} on Flash Trade.")
-
-def debug_asgard_calculations(exchange, asset, asgard_borrow_asset, df, position_size, leverage, asgard_open_fee, asgard_close_fee):
-    st.subheader(f"Debug: Asgard ({exchange.capitalize()}) Calculations for {asset}")
+    for column, average in debug_df.drop(columns='Timestamp').mean().items():
+        unit = '$' if column.endswith('($)') else ''
+        st.write(f"Average {column.rsplit(' (', 1)[0]}: {unit}{average:.6f}{'%' if column.endswith('(%)') else ''}")
     
-    deposit_column = f'{exchange}.{asset.lower()}Token.depositIRate'
-    borrow_column = f'{exchange}.{asgard_borrow_asset.lower()}Token.borrowIRate'
+    variable_fees = hourly_fees.sum()
+    st.write(f"Open Fee: ${open_fee:.6f}")
+    st.write(f"Close Fee: ${close_fee:.6f}")
+    st.write(f"Total Variable Fees{' (compounded)' if compounding else ''}: ${variable_fees:.6f}")
+    st.write(f"Total Fees: ${open_fee + close_fee + variable_fees:.6f}")
     
-    st.write(f"Asset: {asset}")
-    st.write(f"Borrow Asset: {asgard_borrow_asset}")
-    st.write(f"Position Size: ${position_size:.2f}")
-    st.write(f"Leverage: {leverage}x")
-    st.write(f"Opening Fee: {asgard_open_fee*100:.2f}%")
-    st.write(f"Closing Fee: {asgard_close_fee*100:.2f}%")
+    st.subheader("Rates Over Time")
+    line_chart(debug_df.set_index('Timestamp')[[column for column in debug_df.columns if column.startswith('Hourly') and column.endswith('(%)')]],
+               f"{schedule.name} debug rates")
     
-    if deposit_column in df.columns and borrow_column in df.columns:
-        yearly_deposit_rates = df[deposit_column] * 100  # Convert to percentage
-        yearly_borrow_rates = df[borrow_column] * 100  # Convert to percentage
-        deposit_rates = df[deposit_column] / (365 * 24) * 100
-        borrow_rates = df[borrow_column] / (365 * 24) * 100
-        net_rates = borrow_rates - (borrow_rates / leverage) - deposit_rates
-        hourly_fees = net_rates / 100 * position_size
-        
-        st.write("Rates and Fees:")
-        debug_df = pd.DataFrame({
-            'Timestamp': df['createdAt'],
-            'Yearly Deposit Rate (%)': yearly_deposit_rates,
-            'Yearly Borrow Rate (%)': yearly_borrow_rates,
-            'Hourly Deposit Rate (%)': deposit_rates,
-            'Hourly Borrow Rate (%)': borrow_rates,
-            'Hourly Net Rate (%)': net_rates,
-            'Hourly Fees ($)': hourly_fees
-        })
-        st.dataframe(debug_df.style.format({
-            'Yearly Deposit Rate (%)': '{:.6f}',
-            'Yearly Borrow Rate (%)': '{:.6f}',
-            'Hourly Deposit Rate (%)': '{:.6f}',
-            'Hourly Borrow Rate (%)': '{:.6f}',
-            'Hourly Net Rate (%)': '{:.6f}',
-            'Hourly Fees ($)': '{:.6f}'
-        }))
-        
-        st.write(f"Average Yearly Deposit Rate: {yearly_deposit_rates.mean():.6f}%")
-        st.write(f"Average Yearly Borrow Rate: {yearly_borrow_rates.mean():.6f}%")
-        st.write(f"Average Hourly Deposit Rate: {deposit_rates.mean():.6f}%")
-        st.write(f"Average Hourly Borrow Rate: {borrow_rates.mean():.6f}%")
-        st.write(f"Average Hourly Net Rate: {net_rates.mean():.6f}%")
-        st.write(f"Average Hourly Fees: ${hourly_fees.mean():.6f}")
-        
-        open_fee = asgard_open_fee * position_size
-        close_fee = asgard_close_fee * position_size
-        variable_fees = hourly_fees.sum()
-        total_fees = open_fee + close_fee + variable_fees
-        
-        st.write(f"Open Fee: ${open_fee:.6f}")
-        st.write(f"Close Fee: ${close_fee:.6f}")
-        st.write(f"Total Variable Fees: ${variable_fees:.6f}")
-        st.write(f"Total Fees: ${total_fees:.6f}")
-        
-        st.subheader("Rates Over Time")
-        rates_chart_df = debug_df.set_index('Timestamp')[['Hourly Deposit Rate (%)', 'Hourly Borrow Rate (%)', 'Hourly Net Rate (%)']]
-        st.line_chart(rates_chart_df)
-        
-        st.subheader("Hourly Fees Over Time")
-        st.line_chart(debug_df.set_index('Timestamp')[['Hourly Fees ($)']])
-    else:
-        st.write("Required data not found in the dataframe.")
+    st.subheader("Hourly Fees Over Time")
+    line_chart(debug_df.set_index('Timestamp')[['Hourly Fees ($)']], f"{schedule.name} debug hourly fees")
 
 # Streamlit UI setup
 st.title('Multi-Exchange Fee Comparison')
@@ -292,8 +176,8 @@ with st.sidebar:
     time_value = st.number_input('Enter number of time units', min_value=1, value=1, step=1)
     time_unit = st.selectbox('Select time unit', ['Hours', 'Days', 'Months'], index=2)
     SELECTED_ASSET = st.selectbox('Select Asset', ASSETS, index=2)
-    INITIAL_CAPITAL = st.number_input('Initial Capital (USD)', min_value=1.0, value=10000.0, step=100.0)
-    LEVERAGE = st.selectbox('Select Leverage', LEVERAGE_OPTIONS, index=1)
+    INITIAL_CAPITAL = st.number_input('Initial Capital (USD)', min_value=1.0, value=DEFAULT_CAPITAL, step=100.0)
+    LEVERAGE = st.selectbox('Select Leverage', LEVERAGE_OPTIONS, index=LEVERAGE_OPTIONS.index(DEFAULT_LEVERAGE))
     ASGARD_BORROW_ASSET = st.selectbox('Select Asgard Borrow Asset', ASGARD_BORROW_ASSETS)
     
     # New inputs for Asgard fees
@@ -301,12 +185,16 @@ with st.sidebar:
     ASGARD_OPEN_FEE = st.number_input('Asgard Opening Fee (%)', min_value=0.0, max_value=100.0, value=0.06, step=0.01, format="%.2f") / 100
     ASGARD_CLOSE_FEE = st.number_input('Asgard Closing Fee (%)', min_value=0.0, max_value=100.0, value=0.06, step=0.01, format="%.2f") / 100
 
+    COMPOUNDING = st.toggle('Compound variable fees', help="Charge each hour's variable fee on the balance carried forward instead of the initial position")
+
+    st.subheader('Charts')
+    st.toggle('Full resolution charts', key='full_resolution_charts')
+    st.selectbox('Downsampling method', DOWNSAMPLING_METHODS, key='chart_downsampling',
+                 disabled=st.session_state.get('full_resolution_charts', False))
+    LIVE_MODE = st.toggle('Live mode', help=f"Poll for new snapshots every {LIVE_POLL_SECONDS}s and extend the charts in place")
+
 # Calculate date range
-end_date = datetime.now()
-if time_unit == 'Months':
-    start_date = end_date - relativedelta(months=time_value)
-else:
-    start_date = end_date - timedelta(**{time_unit.lower(): time_value})
+start_date, end_date = window_dates(time_value, time_unit)
 start_date_str, end_date_str = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
 # Display selected inputs
@@ -321,32 +209,47 @@ st.write(f"Asgard Opening Fee: {ASGARD_OPEN_FEE*100:.2f}%")
 st.write(f"Asgard Closing Fee: {ASGARD_CLOSE_FEE*100:.2f}%")
 
 # Automatically calculate fees
-data = fetch_data(start_date_str, end_date_str)
-if data:
+# Data and the shared precomputed results come from the process-wide service, so sessions
+# showing the same window share one upstream fetch
+service = get_service()
+get_warmer()
+with pipeline.stage('Load window') as stage:
+    window = service.get_window(start_date_str, end_date_str, fetch_data, pipeline)
+    if window is not None:
+        stage['rows'], stage['bytes'] = len(window.df), int(window.df.memory_usage(deep=True).sum())
+if window is not None:
     st.success("Data fetched successfully!")
-    df = pd.json_normalize(data)
+    df, data_digest = window.df, window.digest
     position_size = INITIAL_CAPITAL * LEVERAGE
     
     displayed_exchanges = get_displayed_exchanges(ASGARD_BORROW_ASSET)
 
-    exchange_names = {
-        'drift': 'Drift', 
-        'flash': 'Flash Trade', 
-        'jup': 'Jup Perps', 
-        'marginfi': 'Asgard (MarginFi)', 
-        'kamino': 'Asgard (Kamino)'
-    }
+    # Fee results are cached per dataset and configuration, so reruns only recompute what changed
+    fee_key = (data_digest, SELECTED_ASSET, LEVERAGE, ASGARD_BORROW_ASSET, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE, INITIAL_CAPITAL)
+    with pipeline.stage('Per-venue fees', rows=len(df)):
+        fees_data = cached_venue_fees(window, *fee_key[1:])
+    for ex in displayed_exchanges:
+        if not fees_data[ex][5]:
+            st.warning(missing_data_warning(ex, SELECTED_ASSET))
+
+    # Fees for every asset x leverage x borrow asset x venue, computed in one batched pass
+    with pipeline.stage('Fee grid', rows=len(df)):
+        if not COMPOUNDING and np.isclose(ASGARD_OPEN_FEE, DEFAULT_ASGARD_FEE) and np.isclose(ASGARD_CLOSE_FEE, DEFAULT_ASGARD_FEE):
+            fee_grid = scale_fee_grid(window.unit_fee_grid, INITIAL_CAPITAL)
+        else:
+            fee_grid = cached_fees(('fee_grid', data_digest, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE, INITIAL_CAPITAL, COMPOUNDING), lambda: compute_fee_grid(
+                window.schedules, INITIAL_CAPITAL, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE,
+                ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges, COMPOUNDING))
+    selected_fees = select_configuration(fee_grid, SELECTED_ASSET, LEVERAGE, ASGARD_BORROW_ASSET).loc[displayed_exchanges]
 
-    fees_data = {ex: calculate_exchange_fees(df, ex, SELECTED_ASSET, position_size, LEVERAGE, ASGARD_BORROW_ASSET, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE) for ex in displayed_exchanges}
-    
     # Create and display fee comparison table
     fee_df = pd.DataFrame({
-        'Exchange': [exchange_names[ex] for ex in displayed_exchanges],
-        'Discount': ['None' if fees_data[ex][6] is None else fees_data[ex][6] for ex in displayed_exchanges],
-        'Open Fees': [fees_data[ex][0] for ex in displayed_exchanges],
-        'Variable Fees': [fees_data[ex][1] for ex in displayed_exchanges],
-        'Close Fees': [fees_data[ex][2] for ex in displayed_exchanges],
-        'Total Fees': [fees_data[ex][3] for ex in displayed_exchanges]
+        'Exchange': [EXCHANGE_NAMES[ex] for ex in displayed_exchanges],
+        'Discount': selected_fees['discount'].fillna('None').tolist(),
+        'Open Fees': selected_fees['open_fee'].tolist(),
+        'Variable Fees': selected_fees['variable_fees'].tolist(),
+        'Close Fees': selected_fees['close_fee'].tolist(),
+        'Total Fees': selected_fees['total_fees'].tolist()
     })
     fee_df = fee_df[['Exchange', 'Discount', 'Open Fees', 'Variable Fees', 'Close Fees', 'Total Fees']]
 
@@ -359,84 +262,268 @@ if data:
         'Discount': '{}'
     }))
     
+    # Display the cheapest venue for every configuration
+    st.subheader("Best Venue per Configuration")
+    best_df = best_venues(fee_grid)
+    best_df['exchange'] = best_df['exchange'].map(EXCHANGE_NAMES)
+    best_matrix = best_df.pivot(index=['borrow_asset', 'asset'], columns='leverage', values='exchange')
+    best_matrix.columns = [f"{leverage}x" for leverage in best_matrix.columns]
+    best_matrix.index.names = ['Borrow Asset', 'Asset']
+    st.table(best_matrix)
+
+    # Prefix sums over every rate column, built once per dataset; window queries are lookups
+    rate_index = window.rate_index
+    venue_terms = {ex: rate_terms(ex, SELECTED_ASSET, LEVERAGE, ASGARD_BORROW_ASSET) for ex in displayed_exchanges if fees_data[ex][5]}
+
+    # Sub-window of the loaded history used by the statistics and charts below
+    window_start, window_end = pd.to_datetime(rate_index.timestamps[[0, -1]]).to_pydatetime()
+    if window_start < window_end:
+        window_start, window_end = st.slider('Analysis Window (UTC)', min_value=window_start, max_value=window_end,
+                                             value=(window_start, window_end), step=timedelta(hours=1), format='YYYY-MM-DD HH:mm')
+    window_i, window_j = rate_index.locate(window_start, window_end)
+    window_index = pd.DatetimeIndex(rate_index.timestamps[window_i:window_j])
+    window_schedules = window.schedules.select(rows=slice(window_i, window_j))
+
+    # With compounding, the window's variable fees accrue on the balance carried forward hour by hour
+    compounded_window_fees = {}
+    if COMPOUNDING and venue_terms:
+        window_rates, _ = hourly_rate_matrix(window_schedules, [(ex, SELECTED_ASSET, ASGARD_BORROW_ASSET) for ex in venue_terms], [LEVERAGE])
+        compounded_window_fees = dict(zip(venue_terms, compounded_fees(window_rates[:, :, 0], position_size).T))
+    window_variable_fees = {ex: fees[-1] if len(fees) else 0.0 for ex, fees in compounded_window_fees.items()}
+
     # Display rate statistics
     st.subheader("Rate Statistics")
     cols = st.columns(len(displayed_exchanges))
     for i, ex in enumerate(displayed_exchanges):
         with cols[i]:
-            st.write(f"{exchange_names[ex]} Rates")
-            rates = fees_data[ex][4]
-            if fees_data[ex][5]:  # Check if data is available
-                st.write(f"Average: {rates.mean():.4f}%")
-                st.write(f"Total: {rates.sum():.4f}%")
-                st.write(f"Cumulative Effect: {(rates.sum() / 100) * 100:.4f}%")
+            st.write(f"{EXCHANGE_NAMES[ex]} Rates")
+            if ex in venue_terms:  # Check if data is available
+                window_rate_sum = rate_index.window_sum(venue_terms[ex], window_i, window_j)
+                st.write(f"Average: {rate_index.window_mean(venue_terms[ex], window_i, window_j):.4f}%")
+                st.write(f"Total: {window_rate_sum:.4f}%")
+                if COMPOUNDING:
+                    st.write(f"Variable Fees (compounded): ${window_variable_fees[ex]:.2f}")
+                else:
+                    st.write(f"Variable Fees: ${window_rate_sum / 100 * position_size:.2f}")
             else:
                 st.write("No data available")
     
     # Create and display charts
     st.subheader("Rates Over Time")
-    rates_df = pd.DataFrame({exchange_names[ex]: fees_data[ex][4] for ex in displayed_exchanges if fees_data[ex][5]})
+    rates_df = pd.DataFrame({EXCHANGE_NAMES[ex]: fees_data[ex][4] for ex in displayed_exchanges if fees_data[ex][5]})
     if not rates_df.empty:
-        st.line_chart(rates_df)
+        line_chart(rates_df.iloc[window_i:window_j], "Rates over time")
     else:
         st.write("No data available for rates over time")
+
+    # Rolling statistics are built once per dataset and configuration; the analysis window only slices them
+    if not rates_df.empty:
+        st.subheader("Rolling Rate Statistics")
+        with pipeline.stage('Rolling statistics', rows=len(df)):
+            rolling = cached_fees(('rolling_stats',) + fee_key[:4], lambda: RollingRateStats(
+                rates_df.set_axis(pd.DatetimeIndex(rate_index.timestamps))))
+        summary_df = rolling.summary(window_i, window_j)
+        st.dataframe(summary_df, column_config={
+            **{column: st.column_config.NumberColumn(format='%.6f%%') for column in summary_df.columns[:-1]},
+            'Cheapest Hours': st.column_config.ProgressColumn(format='percent', min_value=0.0, max_value=1.0),
+        })
+        rolling_label = st.radio('Rolling window', list(ROLLING_WINDOWS), horizontal=True)
+        st.write(f"Rolling {rolling_label} mean rate (%)")
+        line_chart(rolling.series(rolling_label, 'Mean', window_i, window_j), f"Rolling {rolling_label} mean")
+        st.write(f"Rolling {rolling_label} volatility (%)")
+        line_chart(rolling.series(rolling_label, 'Volatility', window_i, window_j), f"Rolling {rolling_label} volatility")
+        quantile_venue = st.selectbox('Quantile venue', rolling.venues)
+        st.write(f"Rolling {rolling_label} P10/P50/P90 of {quantile_venue} (%)")
+        line_chart(rolling.quantile_series(rolling_label, quantile_venue, window_i, window_j), f"Rolling {rolling_label} quantiles")
     
     # Create hourly variable fees chart for all exchanges
     st.subheader("Hourly Variable Fees Comparison")
-    hourly_fees_df = pd.DataFrame({
-        exchange_names[ex]: calculate_hourly_variable_fees(df, ex, SELECTED_ASSET, position_size, LEVERAGE, ASGARD_BORROW_ASSET)
-        for ex in displayed_exchanges
-    })
-    hourly_fees_df.index = pd.to_datetime(df['createdAt'])
+    with pipeline.stage('Hourly fee series', rows=len(df)):
+        hourly_fees_df = cached_hourly_fees(window, *fee_key[1:])
     
     # Display statistics
-    st.write("Average Hourly Variable Fees:")
+    st.write("Average Hourly Variable Fees (compounded):" if COMPOUNDING else "Average Hourly Variable Fees:")
     for ex in displayed_exchanges:
-        avg_fee = hourly_fees_df[exchange_names[ex]].mean()
-        st.write(f"{exchange_names[ex]}: ${avg_fee:.6f}")
+        if ex not in venue_terms:
+            avg_fee = 0.0
+        elif COMPOUNDING:
+            avg_fee = window_variable_fees[ex] / max(window_j - window_i, 1)
+        else:
+            avg_fee = rate_index.window_mean(venue_terms[ex], window_i, window_j) / 100 * position_size
+        st.write(f"{EXCHANGE_NAMES[ex]}: ${avg_fee:.6f}")
     
     # Create and display the chart
-    st.line_chart(hourly_fees_df)
+    line_chart(hourly_fees_df.iloc[window_i:window_j], "Hourly variable fees")
+
+    # Cumulative variable fees for the window, read from the prefix sums or compounded hour by hour
+    cumulative_fees_df = pd.DataFrame({
+        EXCHANGE_NAMES[ex]: rate_index.cumulative(venue_terms[ex], window_i, window_j) / 100 * position_size
+        if ex in venue_terms else np.zeros(window_j - window_i)
+        for ex in displayed_exchanges
+    }, index=window_index)
+    for ex, fees in compounded_window_fees.items():
+        cumulative_fees_df[EXCHANGE_NAMES[ex]] = fees
 
     # Create and display cumulative variable fees chart
     st.subheader("Cumulative Variable Fees Comparison")
-    cumulative_fees_df = hourly_fees_df.cumsum()
-    st.line_chart(cumulative_fees_df)
+    line_chart(cumulative_fees_df, "Cumulative variable fees")
     
     st.subheader("Total Fees Over Time")
-    total_fees_df = pd.DataFrame(index=pd.to_datetime(df['createdAt']))
+    total_fees_df = pd.DataFrame(index=window_index)
 
     for ex in displayed_exchanges:
-        if fees_data[ex][5]:  # If data is available
-            open_fee, variable_fees, close_fee, _, rates, _ = fees_data[ex][:6]
-            
-            # Start with open fee
-            fees_series = pd.Series(open_fee, index=total_fees_df.index)
-            
-            # Add variable fees cumulatively
-            cumulative_variable_fees = (rates.cumsum() / 100 * position_size).values
-            fees_series += cumulative_variable_fees
-            
-            # Add close fee at the end
-            fees_series.iloc[-1] += close_fee
-            
-            total_fees_df[exchange_names[ex]] = fees_series
+        if ex in venue_terms:  # If data is available
+            # Start with open fee, add variable fees cumulatively and the close fee at the end
+            fees_series = selected_fees.at[ex, 'open_fee'] + cumulative_fees_df[EXCHANGE_NAMES[ex]]
+            if len(fees_series):
+                fees_series.iloc[-1] += selected_fees.at[ex, 'close_fee']
+            total_fees_df[EXCHANGE_NAMES[ex]] = fees_series
 
     if not total_fees_df.empty:
-        st.line_chart(total_fees_df)
+        line_chart(total_fees_df, "Total fees over time")
     else:
         st.write("No data available for total fees over time")
 
-    # Debug calculations
-    if 'drift' in displayed_exchanges and fees_data['drift'][5]:
-        debug_drift_calculations(df, SELECTED_ASSET, position_size)
+    # Minimum-cost hour-by-hour venue rotation over the analysis window, computed on demand
+    st.subheader("Venue Switching Backtest")
+    if st.toggle("Run switching backtest", key='switching_enabled'):
+        with pipeline.stage('Switching backtest', rows=window_j - window_i):
+            backtest, schedules = cached_fees(
+                ('switching', data_digest, window_i, window_j, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE, INITIAL_CAPITAL),
+                lambda: backtest_grid(window_schedules, INITIAL_CAPITAL, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE,
+                                      ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges))
+        row = backtest.index[(backtest['asset'] == SELECTED_ASSET) & (backtest['leverage'] == LEVERAGE)
+                             & (backtest['borrow_asset'] == ASGARD_BORROW_ASSET)][0]
+        result = backtest.loc[row]
+        cols = st.columns(3)
+        cols[0].metric("Switching Schedule", f"${result['optimal_fees']:.2f}", f"{result['switches']} switches", delta_color='off')
+        cols[1].metric("Best Single Venue", f"${result['best_single_fees']:.2f}", EXCHANGE_NAMES.get(result['best_single_venue'], 'None'), delta_color='off')
+        cols[2].metric("Savings", f"${result['savings']:.2f}")
+
+        st.write("Schedule:")
+        segments = schedule_segments(schedules[:, row], window_index)
+        segments['venue'] = segments['venue'].map(EXCHANGE_NAMES)
+        segments.columns = ['Venue', 'From (UTC)', 'To (UTC)', 'Hours']
+        st.dataframe(segments, hide_index=True)
 
-    if 'flash' in displayed_exchanges and fees_data['flash'][5]:
-        debug_flash_calculations(df, SELECTED_ASSET, position_size)
+        st.write("Savings over the best single venue for every configuration:")
+        savings_matrix = backtest.pivot(index=['borrow_asset', 'asset'], columns='leverage', values='savings')
+        savings_matrix.columns = [f"{leverage}x" for leverage in savings_matrix.columns]
+        savings_matrix.index.names = ['Borrow Asset', 'Asset']
+        st.table(savings_matrix.style.format('${:.2f}'))
+
+    # Every asset (and optionally every borrow asset) at the selected leverage and fees, side by side
+    st.subheader("Multi-Asset Comparison")
+    if st.toggle("Compare all assets", key='comparison_enabled'):
+        compare_borrow_assets = ASGARD_BORROW_ASSETS if st.toggle("Every Asgard borrow asset", key='comparison_all_borrow') else [ASGARD_BORROW_ASSET]
+        with pipeline.stage('Multi-asset comparison', rows=len(df)):
+            comparison, comparison_fees = compare_assets(window, ASSETS, compare_borrow_assets, LEVERAGE,
+                                                         ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE, INITIAL_CAPITAL, COMPOUNDING)
+        comparison_matrix = comparison.pivot(index=['borrow_asset', 'asset'], columns='exchange', values='total_fee')
+        comparison_matrix = comparison_matrix[[ex for ex in EXCHANGE_NAMES if ex in comparison_matrix.columns]]
+        comparison_matrix['Cheapest'] = comparison_matrix.idxmin(axis=1).map(EXCHANGE_NAMES)
+        comparison_matrix = comparison_matrix.rename(columns=EXCHANGE_NAMES).reindex(
+            pd.MultiIndex.from_product([compare_borrow_assets, ASSETS]), fill_value=None)
+        comparison_matrix.index.names = ['Borrow Asset', 'Asset']
+        comparison_matrix.columns.name = None
+        st.write("Total fees:")
+        st.table(comparison_matrix.style.format('${:.2f}', na_rep='-', subset=comparison_matrix.columns[:-1]))
+        st.write("Cumulative variable fees over the analysis window:")
+        window_start_fees = comparison_fees.iloc[window_i - 1] if window_i else 0.0
+        if COMPOUNDING:
+            # Restart the compounded balance at the window start, as in the cumulative fees chart
+            line_chart(position_size * ((position_size + comparison_fees.iloc[window_i:window_j]) / (position_size + window_start_fees) - 1),
+                       "Multi-asset cumulative fees")
+        else:
+            line_chart(comparison_fees.iloc[window_i:window_j] - window_start_fees, "Multi-asset cumulative fees")
 
-    for ex in ['marginfi', 'kamino']:
-        if ex in displayed_exchanges and fees_data[ex][5]:
-            debug_asgard_calculations(ex, SELECTED_ASSET, ASGARD_BORROW_ASSET, df, position_size, LEVERAGE, ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE)
+    # Block-bootstrap projection of the fees for holding each venue over the next N days
+    st.subheader("Fee Projection")
+    if venue_terms and st.toggle("Run fee projection", key='projection_enabled'):
+        cols = st.columns(5)
+        projection_days = cols[0].number_input('Horizon (days)', min_value=1, max_value=365, value=30, step=1)
+        projection_paths = cols[1].number_input('Paths', min_value=100, max_value=200000, value=PROJECTION_PATHS, step=1000)
+        block_hours = cols[2].number_input('Block (hours)', min_value=1, max_value=24 * 30, value=BLOCK_HOURS, step=1)
+        projection_seed = cols[3].number_input('Seed', min_value=0, value=0, step=1)
+        projection_workers = cols[4].number_input('Processes', min_value=1, max_value=32, value=1, step=1)
+        projected = list(venue_terms)
+        with pipeline.stage('Fee projection', rows=projection_paths):
+            projection = cached_fees(
+                ('projection',) + fee_key + (window_i, window_j, projection_days, projection_paths, block_hours, projection_seed),
+                lambda: project_fees(
+                    hourly_rate_matrix(window_schedules, [(ex, SELECTED_ASSET, ASGARD_BORROW_ASSET) for ex in projected], [LEVERAGE])[0][:, :, 0],
+                    [EXCHANGE_NAMES[ex] for ex in projected], position_size,
+                    selected_fees.loc[projected, 'open_fee'].to_numpy(), selected_fees.loc[projected, 'close_fee'].to_numpy(),
+                    projection_days * 24, projection_paths, block_hours, projection_seed, workers=projection_workers))
+        st.write(f"Total fees over the next {projection_days} days, from {projection_paths:,} paths resampled from the analysis window:")
+        st.table(projection.style.format('${:.2f}'))
+
+    # Debug calculations, rendered only when switched on and built from the series above
+    st.subheader("Debug Calculations")
+    for ex in displayed_exchanges:
+        if not fees_data[ex][5]:
+            continue
+        if not st.toggle(f"Show {EXCHANGE_NAMES[ex]} details", key=f'debug_{ex}_enabled'):
+            continue
+        with pipeline.stage(f"Debug: {EXCHANGE_NAMES[ex]}", rows=len(df)):
+            debug_calculations(ex, SELECTED_ASSET, ASGARD_BORROW_ASSET, df, position_size, LEVERAGE, fees_data[ex][4], hourly_fees_df[EXCHANGE_NAMES[ex]],
+                               selected_fees.at[ex, 'open_fee'], selected_fees.at[ex, 'close_fee'], fees_data[ex][6], COMPOUNDING)
 
     # Add explanatory text
-    st.info("Note: For variable fees, positive values indicate fees paid by the trader, while negative values indicate fees received by the trader.")
\ No newline at end of file
+    st.info("Note: For variable fees, positive values indicate fees paid by the trader, while negative values indicate fees received by the trader.")
+
+    # Month-partitioned Arrow/Parquet files of this window for notebooks; see history_export.py
+    exported = None
+    with st.sidebar.expander('Export'):
+        if not arrow_available():
+            st.info("Install pyarrow to export the history and fee results.")
+        else:
+            export_dir = st.text_input('Export directory', EXPORT_DIR)
+            export_format = st.selectbox('Export format', list(EXPORT_FORMATS), help="Arrow files are memory-mapped on load; Parquet files are smaller")
+            if st.button('Export window'):
+                with pipeline.stage('Export', rows=len(df)) as stage:
+                    paths = export_window(df, export_dir, start_date_str, end_date_str, INITIAL_CAPITAL,
+                                          ASGARD_OPEN_FEE, ASGARD_CLOSE_FEE, format=export_format)
+                    stage['bytes'] = sum(os.path.getsize(path) for path in paths)
+                st.success(f"Wrote {len(paths)} files under {export_dir}")
+            exported = open_export(export_dir, 'rates')
+            if exported is not None:
+                exported_at = exported.column('createdAt')
+                st.caption(f"Exported history: {exported.num_rows} hours, {exported_at[0].as_py():%Y-%m-%d} to {exported_at[-1].as_py():%Y-%m-%d}")
+
+    # Years of exported history, read column by column from the memory-mapped files
+    if exported is not None and st.toggle("Browse exported history", key='exported_history_enabled'):
+        st.subheader("Exported History")
+        rate_column = st.selectbox('Rate column', [name for name in exported.column_names if name != 'createdAt'])
+        history = exported.select(['createdAt', rate_column]).to_pandas().set_index('createdAt')
+        line_chart(history, "Exported history")
+
+# Cache statistics, used to tune FEE_CACHE_TTL against the upstream refresh cadence
+with st.sidebar.expander('Cache Statistics'):
+    st.dataframe(cache_stats().style.format({'Hit Rate': '{:.0%}'}))
+    st.write("Shared data service:")
+    st.dataframe(pd.Series(service.stats(), name='Count'))
+    st.write("Cache warmer:")
+    st.dataframe(pd.Series(get_warmer().stats(), name='Value').astype(str))
+
+# Stage timings of this run, also appended to the JSON log and written as Prometheus metrics.
+# Stages nest (a chart inside a debug panel) and parallel fetch chunks add up, so the
+# seconds column can sum to more than the run took.
+profiler = st.session_state['active_profiler']
+if profiler is not None:
+    profiler.disable()
+    st.session_state['active_profiler'] = None
+export_run(pipeline)
+with st.sidebar.expander('Pipeline Timings'):
+    st.caption(f"This run took {pipeline.elapsed():.3f}s")
+    st.dataframe(pipeline.frame(), column_config={'Seconds': st.column_config.NumberColumn(format='%.4f')})
+    st.toggle('Profile reruns', key='profile_reruns', help="Run every rerun under cProfile and offer the report for download")
+    if profiler is not None:
+        st.download_button('Download profile report', profile_report(profiler), file_name='dashboard_profile.txt', on_click='ignore')
+        st.download_button('Download profile (.prof)', profile_dump(profiler), file_name='dashboard.prof', on_click='ignore')
+
+# Live tail: the fragment reruns on its own every LIVE_POLL_SECONDS without blocking the
+# script, and reads new snapshots from the service's shared poller
+if window is not None and LIVE_MODE:
+    live_tail(df, venue_terms, position_size, end_date - start_date,
+              (time_value, time_unit, SELECTED_ASSET, LEVERAGE, ASGARD_BORROW_ASSET))
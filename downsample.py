@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+MAX_CHART_POINTS = 1500
+METHODS = ['LTTB', 'Min/Max', 'Mean']
+
+def point_budget(n_points, max_points=MAX_CHART_POINTS):
+    """Number of points to draw for a series of n_points: everything up to max_points."""
+    return min(n_points, max_points)
+
+def _bucket_edges(n_points, n_buckets):
+    return np.linspace(0, n_points, n_buckets + 1).astype(int)
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: positions of the `threshold` points that best keep the shape of y(x)."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    # First and last points are always kept; the rest are split into threshold - 2 buckets.
+    edges = 1 + _bucket_edges(n - 2, threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for b in range(threshold - 2):
+        start, end = edges[b], edges[b + 1]
+        next_start, next_end = (edges[b + 1], edges[b + 2]) if b + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(areas))
+        selected[b + 1] = prev
+    return selected
+
+def minmax_indices(y, threshold):
+    """Positions of the minimum and maximum of each of threshold // 2 equal-width buckets."""
+    n = len(y)
+    n_buckets = threshold // 2
+    if threshold >= n or n_buckets < 1:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    edges = _bucket_edges(n, n_buckets)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if start < end:
+            selected += [start + int(np.argmin(y[start:end])), start + int(np.argmax(y[start:end]))]
+    return np.unique(selected)
+
+def downsample(data, max_points=None, method='LTTB'):
+    """Reduce a chart frame (or series) to about `max_points` rows for display only.
+
+    LTTB and Min/Max keep real rows; for frames with several columns each column gets an
+    equal share of the budget and the selected rows are merged. Mean replaces each bucket
+    by its average, stamped with the bucket's first index value.
+    """
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    n = len(frame)
+    budget = point_budget(n) if max_points is None else min(n, max_points)
+    if budget >= n or frame.shape[1] == 0:
+        return data
+    if method == 'Mean':
+        buckets = np.repeat(np.arange(budget), np.diff(_bucket_edges(n, budget)))
+        result = frame.groupby(buckets).mean()
+        result.index = frame.index[_bucket_edges(n, budget)[:-1]]
+    else:
+        per_column = max(budget // frame.shape[1], 4)
+        x = frame.index.asi8.astype(float) if isinstance(frame.index, pd.DatetimeIndex) else np.arange(n, dtype=float)
+        selected = [lttb_indices(x, frame[column].to_numpy(dtype=float), per_column) if method == 'LTTB'
+                    else minmax_indices(frame[column].to_numpy(dtype=float), per_column)
+                    for column in frame.columns]
+        result = frame.iloc[np.unique(np.concatenate(selected))]
+    return result.iloc[:, 0].rename(data.name) if isinstance(data, pd.Series) else result
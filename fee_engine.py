@@ -0,0 +1,343 @@
+import copy
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ASSETS = ['SOL', 'ETH', 'BONK']
+LEVERAGE_OPTIONS = [1.5, 2.0, 3.0, 4.0, 5.0]
+ASGARD_BORROW_ASSETS = ['USDC', 'USDT', 'ETH']
+PERP_EXCHANGES = ['drift', 'flash', 'jup']
+ASGARD_EXCHANGES = ['marginfi', 'kamino']
+DISCOUNTED_ASSETS = ['SOL', 'ETH', 'BTC']
+HOURS_PER_YEAR = 365 * 24
+
+# How a venue charges a position, declared once and compiled per dataset by FeeSchedules.
+# Column templates are filled with {asset}, {asset_lower} and {borrow_lower}. Rate columns
+# are % per hour, or APR fractions when annual_rates is set. With levered_borrow the hourly
+# rate is borrow - borrow / leverage - deposit (only the borrowed part of the position pays
+# interest). open_fee/close_fee are fractions of the position size, per asset where listed
+# in asset_fees, or None for the user-supplied Asgard fees; assets in discounted_assets get
+# `discount` off both.
+FeeSchedule = namedtuple('FeeSchedule', [
+    'name', 'rate_label', 'borrow_column', 'deposit_column', 'annual_rates', 'levered_borrow',
+    'open_fee', 'close_fee', 'asset_fees', 'discounted_assets', 'discount',
+])
+
+def _asgard_schedule(exchange, name):
+    return FeeSchedule(name, 'Net', f'{exchange}.{{borrow_lower}}Token.borrowIRate', f'{exchange}.{{asset_lower}}Token.depositIRate',
+                       True, True, None, None, {}, DISCOUNTED_ASSETS, 0.75)
+
+FEE_SCHEDULES = {
+    'drift': FeeSchedule('Drift', 'Funding', 'drift.{asset}Perp.driftHourlyFunding', None, False, False,
+                         0.001, 0.001, {}, DISCOUNTED_ASSETS, 0.75),
+    'flash': FeeSchedule('Flash Trade', 'Borrow', 'flashPerp.{asset_lower}Token.HourlyBorrowRate', None, False, False,
+                         0.0008, 0.0008, {'BONK': 0.0015}, [], 0.0),
+    'jup': FeeSchedule('Jup Perps', 'Borrow', 'jupPerp.{asset_lower}Token.HourlyBorrowRate', None, False, False,
+                       0.0006, 0.0006, {}, [], 0.0),
+    'marginfi': _asgard_schedule('marginfi', 'Asgard (MarginFi)'),
+    'kamino': _asgard_schedule('kamino', 'Asgard (Kamino)'),
+}
+EXCHANGE_NAMES = {exchange: schedule.name for exchange, schedule in FEE_SCHEDULES.items()}
+
+FEE_COLUMNS = ['open_fee', 'variable_fees', 'close_fee', 'total_fees']
+GRID_COLUMNS = ['asset', 'leverage', 'borrow_asset', 'exchange', 'discount', 'open_fee',
+                'variable_fees', 'close_fee', 'total_fees', 'data_available']
+
+def get_displayed_exchanges(borrow_asset):
+    if borrow_asset in ['USDC', 'USDT']:
+        return ['drift', 'flash', 'jup', 'marginfi', 'kamino']
+    else:
+        return ['marginfi', 'kamino']
+
+def rate_columns(exchange, asset, borrow_asset):
+    """Return the (borrow, deposit) columns a venue's hourly rate is built from.
+
+    Perp venues have a single rate column and no deposit column.
+    """
+    schedule = FEE_SCHEDULES[exchange]
+    fields = {'asset': asset, 'asset_lower': asset.lower(), 'borrow_lower': borrow_asset.lower()}
+    deposit_column = schedule.deposit_column.format(**fields) if schedule.deposit_column else None
+    return schedule.borrow_column.format(**fields), deposit_column
+
+def required_columns(assets, borrow_assets, exchanges=PERP_EXCHANGES + ASGARD_EXCHANGES):
+    """Return every rate column the fee calculations can reference."""
+    columns = []
+    for exchange in exchanges:
+        for asset in assets:
+            for borrow_asset in borrow_assets:
+                for column in rate_columns(exchange, asset, borrow_asset):
+                    if column is not None and column not in columns:
+                        columns.append(column)
+    return columns
+
+def hourly_rate_scale(exchange):
+    """Factor turning a venue's raw rate column values into % per hour."""
+    return 100 / HOURS_PER_YEAR if FEE_SCHEDULES[exchange].annual_rates else 1.0
+
+def fee_rates(exchange, asset, asgard_open_fee, asgard_close_fee):
+    """Return (open fee rate, close fee rate, discount label) for a venue."""
+    schedule = FEE_SCHEDULES[exchange]
+    if schedule.open_fee is None:
+        open_rate, close_rate = asgard_open_fee, asgard_close_fee
+    else:
+        open_rate = schedule.asset_fees.get(asset, schedule.open_fee)
+        close_rate = schedule.asset_fees.get(asset, schedule.close_fee)
+    if asset in schedule.discounted_assets:
+        return open_rate * (1 - schedule.discount), close_rate * (1 - schedule.discount), f'{schedule.discount:.0%}'
+    return open_rate, close_rate, None
+
+def build_rate_matrix(df, keys):
+    """Stack the rate columns needed by `keys` into one hourly matrix.
+
+    `keys` is a list of (exchange, asset, borrow_asset). Returns the (hours x columns)
+    matrix, the borrow and deposit column index of every key (-1 if absent) and a
+    per-key data availability mask.
+    """
+    columns = []
+    column_index = {}
+    borrow_idx = np.full(len(keys), -1)
+    deposit_idx = np.full(len(keys), -1)
+    available = np.zeros(len(keys), dtype=bool)
+    for i, (exchange, asset, borrow_asset) in enumerate(keys):
+        borrow_column, deposit_column = rate_columns(exchange, asset, borrow_asset)
+        if borrow_column not in df.columns or (deposit_column is not None and deposit_column not in df.columns):
+            continue
+        available[i] = True
+        for column, idx in ((borrow_column, borrow_idx), (deposit_column, deposit_idx)):
+            if column is None:
+                continue
+            if column not in column_index:
+                column_index[column] = len(columns)
+                columns.append(column)
+            idx[i] = column_index[column]
+    matrix = df[columns].to_numpy(dtype=float) if columns else np.empty((len(df), 0))
+    return matrix, borrow_idx, deposit_idx, available
+
+def window_keys(assets, borrow_assets):
+    """Every (exchange, asset, borrow_asset) key of FEE_SCHEDULES, for compiling a whole window."""
+    return [(exchange, asset, borrow_asset) for borrow_asset in borrow_assets for exchange in FEE_SCHEDULES for asset in assets]
+
+def compile_schedules(df, keys):
+    """FeeSchedules of `keys` over `df`, selected from it when `df` is already a compiled FeeSchedules."""
+    if isinstance(df, FeeSchedules):
+        return df.select(keys)
+    return FeeSchedules(df, keys)
+
+class FeeSchedules:
+    """FEE_SCHEDULES of a list of (exchange, asset, borrow_asset) keys compiled against one dataset.
+
+    Compiling resolves every key's columns once into a single column-index map over a
+    matrix of the distinct rate columns, so rates and fees of all keys are evaluated
+    together without touching the DataFrame again. A window compiles every key once when
+    it loads (see window_keys); the fee functions below accept that compiled object in
+    place of the frame and select the keys and hours they need from it.
+    """
+
+    def __init__(self, df, keys):
+        self.keys = list(keys)
+        self.index = df.index
+        self.created_at = df['createdAt'] if 'createdAt' in df else None
+        matrix, self.borrow_idx, self.deposit_idx, self.available = build_rate_matrix(df, self.keys)
+        # The trailing zero column makes a missing (-1) column index read as zero.
+        self.matrix = np.append(matrix, np.zeros((len(matrix), 1)), axis=1)
+        schedules = [FEE_SCHEDULES[exchange] for exchange, _, _ in self.keys]
+        self._periods = np.array([HOURS_PER_YEAR if schedule.annual_rates else 1 for schedule in schedules], dtype=float)
+        self._percent = np.array([100 if schedule.annual_rates else 1 for schedule in schedules], dtype=float)
+        self._levered = np.array([schedule.levered_borrow for schedule in schedules], dtype=float)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.index)
+
+    def select(self, keys=None, rows=None):
+        """The compiled keys `keys` (default all) over the hours `rows` (a slice, default all).
+
+        The selection shares this object's matrix, so it costs no pass over the data.
+        Raises KeyError for a key that was not compiled.
+        """
+        selected = copy.copy(self)
+        if rows is not None:
+            selected.matrix = self.matrix[rows]
+            selected.index = self.index[rows]
+            selected.created_at = None if self.created_at is None else self.created_at.iloc[rows]
+        if keys is not None:
+            positions = [self._positions[key] for key in keys]
+            selected.keys = list(keys)
+            for name in ['borrow_idx', 'deposit_idx', 'available', '_periods', '_percent', '_levered']:
+                setattr(selected, name, getattr(self, name)[positions])
+            selected._positions = {key: i for i, key in enumerate(selected.keys)}
+        return selected
+
+    def net_rates(self, values, leverage):
+        """Apply every key's rate transform to stacked column values (... x columns + 1).
+
+        Returns hourly rates (%) as (... x keys) for a scalar leverage, or (... x keys x
+        leverages) for a list of leverages.
+        """
+        return self._transform(values[..., self.borrow_idx], values[..., self.deposit_idx], leverage)
+
+    def _transform(self, borrow, deposit, leverage):
+        borrow = borrow / self._periods * self._percent
+        deposit = deposit / self._periods * self._percent
+        levered = self._levered
+        if np.ndim(leverage):
+            leverage = np.asarray(leverage, dtype=float)
+            borrow, deposit, levered = borrow[..., None], deposit[..., None], levered[:, None]
+        return borrow - levered * borrow / leverage - deposit
+
+    def hourly_rates(self, leverage, fill_missing=False):
+        """Hourly rate (%) of every key, hour by hour.
+
+        An hour with a missing value in any of the key's columns has no rate: it is NaN,
+        or zero with fill_missing. Every fee path applies this same per-key, per-hour policy.
+        """
+        rates = self.net_rates(self.matrix, leverage)
+        return np.nan_to_num(rates) if fill_missing else rates
+
+    def observed_hours(self):
+        """(hours x keys) mask of the hours where every column of a key has a value."""
+        observed = ~np.isnan(self.matrix)
+        return observed[:, self.borrow_idx] & observed[:, self.deposit_idx]
+
+    def rate_sums(self, leverage):
+        """Summed hourly rates (%) of every key over its observed hours, as np.nansum of hourly_rates.
+
+        Each key's columns are summed once over its observed hours; the transforms are
+        linear, so they apply to the sums.
+        """
+        observed = self.observed_hours()
+        filled = np.nan_to_num(self.matrix)
+        borrow = np.einsum('hk,hk->k', filled[:, self.borrow_idx], observed)
+        deposit = np.einsum('hk,hk->k', filled[:, self.deposit_idx], observed)
+        return self._transform(borrow, deposit, leverage)
+
+    def fee_rates(self, asgard_open_fee, asgard_close_fee):
+        """Open fee rates, close fee rates and discount labels of every key (zero where unavailable)."""
+        schedule = [fee_rates(exchange, asset, asgard_open_fee, asgard_close_fee) for exchange, asset, _ in self.keys]
+        open_rates = np.array([open_rate for open_rate, _, _ in schedule]) * self.available
+        close_rates = np.array([close_rate for _, close_rate, _ in schedule]) * self.available
+        discounts = [discount if ok else None for (_, _, discount), ok in zip(schedule, self.available)]
+        return open_rates, close_rates, discounts
+
+def calculate_all_exchange_fees(df, exchanges, asset, position_size, leverage, asgard_borrow_asset, asgard_open_fee, asgard_close_fee):
+    """calculate_exchange_fees for several venues of one configuration, from a single compiled pass."""
+    compiled = compile_schedules(df, [(exchange, asset, asgard_borrow_asset) for exchange in exchanges])
+    rates = compiled.hourly_rates(leverage)
+    variable_fees = np.nansum(rates, axis=0) / 100 * position_size
+    open_rates, close_rates, discounts = compiled.fee_rates(asgard_open_fee, asgard_close_fee)
+    results = {}
+    for i, exchange in enumerate(exchanges):
+        if not compiled.available[i]:
+            results[exchange] = (0, 0, 0, 0, pd.Series([0] * len(compiled)), False, None)
+            continue
+        open_fee, close_fee = open_rates[i] * position_size, close_rates[i] * position_size
+        results[exchange] = (open_fee, variable_fees[i], close_fee, open_fee + close_fee + variable_fees[i],
+                             pd.Series(rates[:, i], index=compiled.index), True, discounts[i])
+    return results
+
+def calculate_exchange_fees(df, exchange, asset, position_size, leverage, asgard_borrow_asset, asgard_open_fee, asgard_close_fee):
+    return calculate_all_exchange_fees(df, [exchange], asset, position_size, leverage, asgard_borrow_asset,
+                                       asgard_open_fee, asgard_close_fee)[exchange]
+
+def hourly_variable_fees(df, exchanges, asset, position_size, leverage, asgard_borrow_asset):
+    """Hourly variable fees ($) of several venues as an (hours x venues) frame, from a single compiled pass.
+
+    Venues without data get a column of zeros.
+    """
+    compiled = compile_schedules(df, [(exchange, asset, asgard_borrow_asset) for exchange in exchanges])
+    fees = compiled.hourly_rates(leverage) / 100 * position_size
+    fees[:, ~compiled.available] = 0
+    return pd.DataFrame(fees, index=compiled.index, columns=list(exchanges))
+
+def calculate_hourly_variable_fees(df, exchange, asset, position_size, leverage, asgard_borrow_asset):
+    return hourly_variable_fees(df, [exchange], asset, position_size, leverage, asgard_borrow_asset)[exchange]
+
+def build_hourly_fees_df(df, exchanges, exchange_names, asset, position_size, leverage, asgard_borrow_asset):
+    hourly_fees_df = hourly_variable_fees(df, exchanges, asset, position_size, leverage, asgard_borrow_asset)
+    hourly_fees_df.columns = [exchange_names[ex] for ex in exchanges]
+    hourly_fees_df.index = pd.to_datetime(df.created_at if isinstance(df, FeeSchedules) else df['createdAt'])
+    return hourly_fees_df
+
+def hourly_rate_matrix(df, keys, leverage_options):
+    """Hourly rate (% per hour) of every key at every leverage, hour by hour.
+
+    Returns an (hours x keys x leverages) array, with the Asgard net rate applied to each
+    hour and hours with a missing value read as zero, and the per-key data availability mask.
+    """
+    compiled = compile_schedules(df, keys)
+    return compiled.hourly_rates(leverage_options, fill_missing=True), compiled.available
+
+def compounded_fees(rates, position_size):
+    """Cumulative variable fees when each hour's fee is charged on the balance carried forward.
+
+    `rates` holds hourly rates (%) along axis 0; the balance after hour t is
+    position_size * prod(1 + rate / 100) up to t, so the fees are that minus position_size.
+    """
+    return position_size * (np.cumprod(1 + np.asarray(rates, dtype=float) / 100, axis=0) - 1)
+
+def compute_fee_grid(df, initial_capital, asgard_open_fee, asgard_close_fee,
+                     assets, leverage_options, borrow_assets, exchanges_for, compounding=False):
+    """Compute open, variable, close and total fees for every configuration at once.
+
+    The grid spans assets x leverage_options x borrow_assets x exchanges_for(borrow_asset).
+    All rate columns are summed in a single pass over the compiled rate matrix; leverage
+    and venue fee schedules are then applied by broadcasting. With `compounding`, variable
+    fees accrue on the balance carried forward hour by hour (see compounded_fees) instead
+    of on the initial position. Returns a tidy frame with one row per configuration and
+    the columns in GRID_COLUMNS.
+    """
+    keys = [(exchange, asset, borrow_asset)
+            for borrow_asset in borrow_assets
+            for exchange in exchanges_for(borrow_asset)
+            for asset in assets]
+    leverage = np.asarray(leverage_options, dtype=float)
+    position_size = initial_capital * leverage[None, :]
+
+    compiled = compile_schedules(df, keys)
+    available = compiled.available
+
+    if compounding:
+        hourly_rates = compiled.hourly_rates(leverage, fill_missing=True)
+        growth = compounded_fees(hourly_rates, 1.0)[-1] if len(hourly_rates) else np.zeros((len(keys), len(leverage)))
+        variable_fees = np.where(available[:, None], growth * position_size, 0.0)
+    else:
+        # Every key's columns are summed once over its observed hours; the transforms apply to the sums
+        variable_fees = np.where(available[:, None], compiled.rate_sums(leverage) / 100 * position_size, 0.0)
+
+    open_rates, close_rates, discounts = compiled.fee_rates(asgard_open_fee, asgard_close_fee)
+
+    open_fees = open_rates[:, None] * position_size
+    close_fees = close_rates[:, None] * position_size
+    total_fees = open_fees + close_fees + variable_fees
+
+    n_leverage = len(leverage)
+    return pd.DataFrame({
+        'asset': np.repeat([asset for _, asset, _ in keys], n_leverage),
+        'leverage': np.tile(leverage, len(keys)),
+        'borrow_asset': np.repeat([borrow_asset for _, _, borrow_asset in keys], n_leverage),
+        'exchange': np.repeat([exchange for exchange, _, _ in keys], n_leverage),
+        'discount': np.repeat(discounts, n_leverage),
+        'open_fee': open_fees.ravel(),
+        'variable_fees': variable_fees.ravel(),
+        'close_fee': close_fees.ravel(),
+        'total_fees': total_fees.ravel(),
+        'data_available': np.repeat(available, n_leverage),
+    }, columns=GRID_COLUMNS)
+
+def scale_fee_grid(grid, initial_capital):
+    """Rescale a fee grid computed for $1 of capital; every fee is proportional to capital."""
+    scaled = grid.copy()
+    scaled[FEE_COLUMNS] *= initial_capital
+    return scaled
+
+def select_configuration(grid, asset, leverage, borrow_asset):
+    """Return the grid rows of one (asset, leverage, borrow asset) configuration, indexed by exchange."""
+    mask = (grid['asset'] == asset) & (grid['leverage'] == leverage) & (grid['borrow_asset'] == borrow_asset)
+    return grid[mask].set_index('exchange')
+
+def best_venues(grid):
+    """Return the cheapest venue with data for every (asset, leverage, borrow asset) configuration."""
+    candidates = grid[grid['data_available']]
+    best = candidates.loc[candidates.groupby(['asset', 'leverage', 'borrow_asset'], sort=False)['total_fees'].idxmin()]
+    return best[['asset', 'leverage', 'borrow_asset', 'exchange', 'total_fees']].reset_index(drop=True)
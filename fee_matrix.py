@@ -0,0 +1,61 @@
+import numpy as np
+
+from fee_engine import HOURS_PER_YEAR
+
+LEVERAGE_MIN = 1.1
+LEVERAGE_MAX = 100.0
+LEVERAGE_STEP = 0.1
+HORIZON_MAX_HOURS = HOURS_PER_YEAR
+HORIZON_POINTS = 240
+MAX_AXIS_CELLS = 60
+
+def venue_annual_rates(data):
+    """Annualized borrow rate (%) of every venue in the metadata payload, in display order."""
+    return {
+        'Marginfi': abs(data['marginfi']['netApy'] * 100),
+        'JUP PERP': data['jupPerp']['jupAnnualRate'],
+        'FLASH PERP': data['flashPerp']['flashAnnualRate'],
+    }
+
+def leverage_grid(minimum=LEVERAGE_MIN, maximum=LEVERAGE_MAX, step=LEVERAGE_STEP):
+    """Leverage levels from minimum to maximum (inclusive) in steps of `step`."""
+    return np.round(np.arange(minimum, maximum + step / 2, step), 6)
+
+def horizon_grid(max_hours=HORIZON_MAX_HOURS, points=HORIZON_POINTS):
+    """Whole-hour horizons from 1 hour to max_hours, log-spaced so short horizons keep their detail."""
+    return np.unique(np.round(np.geomspace(1, max_hours, points))).astype(int)
+
+def fee_matrix(initial_margin, annual_rates, leverages, hours, compounding=False):
+    """Borrow fees of every (venue, leverage, horizon) cell in one broadcast.
+
+    The borrowed amount is initial_margin * (leverage - 1), charged at the venue's annual rate
+    (%) pro rata per hour. With `compounding`, each hour's fee is charged on the balance
+    carried forward, i.e. (1 + hourly rate) ** hours - 1. Returns an array of shape
+    (venues, leverages, horizons).
+    """
+    hourly_rates = np.asarray(annual_rates, dtype=float) / 100 / HOURS_PER_YEAR
+    borrowed = initial_margin * (np.asarray(leverages, dtype=float) - 1)
+    hours = np.asarray(hours, dtype=float)
+    if compounding:
+        growth = np.expm1(np.log1p(hourly_rates)[:, None] * hours[None, :])
+    else:
+        growth = hourly_rates[:, None] * hours[None, :]
+    return growth[:, None, :] * borrowed[None, :, None]
+
+def cheapest_venue(matrix):
+    """Index of the cheapest venue for every (leverage, horizon) cell."""
+    return np.argmin(matrix, axis=0)
+
+def axis_slice(values, low, high, max_cells=MAX_AXIS_CELLS):
+    """Positions of the grid values within [low, high], thinned evenly to at most max_cells."""
+    positions = np.flatnonzero((values >= low) & (values <= high))
+    if len(positions) <= max_cells:
+        return positions
+    return positions[np.unique(np.linspace(0, len(positions) - 1, max_cells).round().astype(int))]
+
+def horizon_label(hours):
+    """Short label for a horizon: hours below two days, days otherwise."""
+    if hours < 48:
+        return f"{hours}h"
+    days = hours / 24
+    return f"{days:.0f}d" if days == int(days) else f"{days:.1f}d"
@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from ingest import PARSE_ERRORS, column_paths, iter_snapshots, project_snapshot
+
+API_URL = "http://159.223.14.10:6969/fee-comparisons"
+DATE_FORMAT = '%Y-%m-%d'
+CHUNK_DAYS = 7
+MAX_WORKERS = 8
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 0.5
+REQUEST_TIMEOUT = 60
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide pooled HTTP session, sized for MAX_WORKERS concurrent chunks."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+class _CountingReader:
+    """File-like view of a response body that counts the bytes read and the time spent waiting for them."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def read(self, size=-1):
+        started = time.perf_counter()
+        data = self.raw.read(size)
+        self.seconds += time.perf_counter() - started
+        self.bytes += len(data)
+        return data
+
+def _parse_date(date_str):
+    return datetime.strptime(date_str, DATE_FORMAT).date()
+
+def split_ranges(ranges, chunk_days=CHUNK_DAYS):
+    """Split inclusive (from, to) day ranges into chunks of at most `chunk_days` days."""
+    chunks = []
+    for range_start, range_end in ranges:
+        day, last = _parse_date(range_start), _parse_date(range_end)
+        while day <= last:
+            chunk_end = min(day + timedelta(days=chunk_days - 1), last)
+            chunks.append((day.strftime(DATE_FORMAT), chunk_end.strftime(DATE_FORMAT)))
+            day = chunk_end + timedelta(days=1)
+    return chunks
+
+def fetch_chunk(url, start_date, end_date, session=None, attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS, metrics=None,
+                columns=None):
+    """Fetch the rows created on days start_date..end_date, retrying with exponential backoff.
+
+    The request asks for one extra day so the last day is complete whether or not the API
+    treats `to` as inclusive; rows outside the chunk are dropped so chunks never overlap.
+    A failed status, a dropped or stalled connection and a truncated or malformed body
+    all count as a failed attempt. Returns None once every attempt has failed. With
+    `columns` (dotted json_normalize names), each row is cut down to createdAt and those
+    fields as soon as it is parsed (see ingest.project_snapshot), so only one full row is
+    held at a time. With `metrics`, time spent waiting on the network (with bytes
+    received) and parsing (with rows decoded) is recorded separately.
+    """
+    session = session or get_session()
+    paths = column_paths(columns) if columns is not None else None
+    next_day = (_parse_date(end_date) + timedelta(days=1)).strftime(DATE_FORMAT)
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random()))
+        response = None
+        try:
+            started = time.perf_counter()
+            response = session.get(url, params={'from': start_date, 'to': next_day}, stream=True, timeout=REQUEST_TIMEOUT)
+            if response.status_code != 200:
+                response.close()
+                continue
+            response.raw.decode_content = True
+            body = _CountingReader(response.raw)
+            headers_received = time.perf_counter()
+            rows = [row if paths is None else project_snapshot(row, paths)
+                    for row in iter_snapshots(body) if start_date <= row.get('createdAt', '') < next_day]
+            if metrics is not None:
+                metrics.add('HTTP fetch', headers_received - started + body.seconds, nbytes=body.bytes)
+                metrics.add('JSON decode', time.perf_counter() - headers_received - body.seconds, rows=len(rows))
+            return rows
+        except (requests.RequestException, urllib3.exceptions.HTTPError) + PARSE_ERRORS:
+            # The body is read from response.raw, so read errors come from urllib3 unwrapped
+            if response is not None:
+                response.close()
+            continue
+    return None
+
+def fetch_chunks(url, ranges, chunk_days=CHUNK_DAYS, max_workers=MAX_WORKERS, progress=None, metrics=None, columns=None):
+    """Fetch day ranges concurrently in chunks, yielding (chunk_start, chunk_end, rows) as each completes.
+
+    rows is None for a chunk that failed after all retries. `progress(done, total)` is
+    called from the consuming thread after every chunk; `metrics` and `columns` are
+    passed to fetch_chunk.
+    """
+    chunks = split_ranges(ranges, chunk_days)
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_chunk, url, chunk_start, chunk_end, session, metrics=metrics, columns=columns):
+                   (chunk_start, chunk_end) for chunk_start, chunk_end in chunks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            chunk_start, chunk_end = futures[future]
+            if progress is not None:
+                progress(done, len(chunks))
+            yield chunk_start, chunk_end, future.result()
+
+def fetch_range(url, start_date, end_date, chunk_days=CHUNK_DAYS, max_workers=MAX_WORKERS, progress=None):
+    """Fetch a whole window in parallel chunks.
+
+    Returns the rows in createdAt order with duplicates removed, and the list of
+    (chunk_start, chunk_end) ranges that could not be fetched.
+    """
+    rows_by_created_at = {}
+    failed = []
+    for chunk_start, chunk_end, rows in fetch_chunks(url, [(start_date, end_date)], chunk_days, max_workers, progress):
+        if rows is None:
+            failed.append((chunk_start, chunk_end))
+            continue
+        for row in rows:
+            rows_by_created_at[row['createdAt']] = row
+    return [rows_by_created_at[created_at] for created_at in sorted(rows_by_created_at)], sorted(failed)
@@ -0,0 +1,202 @@
+"""Month-partitioned Arrow IPC or Parquet exports of the rate history and fee results.
+
+Exports the normalized hourly history, the hourly variable fee series of every
+configuration and the fee grid of a date window, so notebooks can start from the
+dashboard's numbers instead of re-deriving them from the API:
+
+    python history_export.py --start 2025-01-01 --end 2025-12-31 --output .fee_exports
+
+Files use a hive-style layout that pyarrow.dataset, polars and duckdb read directly:
+
+    {root}/{dataset}/[key=value/...]month=YYYY-MM/part.arrow
+
+Arrow IPC files are uncompressed, so open_export memory-maps them and hands out
+columns without copying; Parquet files are smaller but are decoded on read.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only exports and the loader need pyarrow
+    pa = pq = None
+
+from cli import load_cli_history, log
+from fee_engine import (
+    ASGARD_BORROW_ASSETS, ASSETS, EXCHANGE_NAMES, LEVERAGE_OPTIONS, FeeSchedules, build_hourly_fees_df, compute_fee_grid,
+    get_displayed_exchanges, window_keys,
+)
+from history_store import HISTORY_DB_PATH
+
+EXPORT_DIR = os.environ.get('FEE_EXPORT_DIR', '.fee_exports')
+FORMATS = {'arrow': 'part.arrow', 'parquet': 'part.parquet'}
+TIME_COLUMN = 'createdAt'
+
+def arrow_available():
+    return pa is not None
+
+def _require_arrow():
+    if pa is None:
+        raise ImportError("Exports need pyarrow: pip install pyarrow")
+
+def _partition_path(root, dataset, partitions):
+    parts = [f"{key}={value}" for key, value in (partitions or {}).items()]
+    return os.path.join(root, dataset, *parts)
+
+def _write_table(table, path, format):
+    """Write a table atomically, so a concurrent reader never maps a half-written file.
+
+    The other format's file of the same partition is removed, so open_export never
+    prefers a stale copy over what was just written.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.part-', suffix='.tmp')
+    os.close(fd)
+    try:
+        if format == 'parquet':
+            pq.write_table(table, temporary)
+        else:
+            with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    for other, name in FORMATS.items():
+        if other != format:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+def _read_table(path):
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+def _timed_frame(df):
+    """The frame with its timestamps as a UTC TIME_COLUMN, whether they came as a column or the index."""
+    if TIME_COLUMN not in df.columns:
+        df = df.rename_axis(TIME_COLUMN).reset_index()
+    return df.assign(**{TIME_COLUMN: pd.to_datetime(df[TIME_COLUMN], utc=True)})
+
+def export_series(df, root, dataset, partitions=None, format='arrow'):
+    """Merge a time series frame into its month partitions under root/dataset.
+
+    Timestamps come from the createdAt column or, failing that, the index. Rows already
+    exported for the same timestamps are replaced, so overlapping exports accumulate into
+    one history. Returns the paths written.
+    """
+    _require_arrow()
+    df = _timed_frame(df)
+    base = _partition_path(root, dataset, partitions)
+    months = df[TIME_COLUMN].dt.strftime('%Y-%m')
+    paths = []
+    for month, rows in df.groupby(months, sort=True):
+        path = os.path.join(base, f'month={month}', FORMATS[format])
+        if os.path.exists(path):
+            rows = pd.concat([_read_table(path).to_pandas(), rows], ignore_index=True)
+            rows = rows.drop_duplicates(TIME_COLUMN, keep='last').sort_values(TIME_COLUMN)
+        _write_table(pa.Table.from_pandas(rows, preserve_index=False), path, format)
+        paths.append(path)
+    return paths
+
+def export_table(df, root, dataset, partitions=None, format='arrow'):
+    """Write a result table (one without a time axis) to root/dataset/[partitions]/, replacing it."""
+    _require_arrow()
+    path = os.path.join(_partition_path(root, dataset, partitions), FORMATS[format])
+    _write_table(pa.Table.from_pandas(df, preserve_index=False), path, format)
+    return path
+
+def open_export(root, dataset, start=None, end=None, partitions=None):
+    """Memory-map an exported time series and return the rows with start <= createdAt <= end as a pyarrow Table.
+
+    Only the month files overlapping the range are opened. Arrow IPC columns reference
+    the mapped files directly (one chunk per month), so years of history open without
+    being read into memory; call .to_pandas() on a column selection to materialize it.
+    Months exported with different columns are combined, with nulls for the columns a
+    month lacks.
+    """
+    _require_arrow()
+    base = _partition_path(root, dataset, partitions)
+    first = pd.Timestamp(start, tz='UTC') if start is not None else None
+    last = pd.Timestamp(end, tz='UTC') if end is not None else None
+    tables = []
+    for entry in sorted(os.listdir(base)) if os.path.isdir(base) else []:
+        month = entry.partition('month=')[2]
+        if not month:
+            continue
+        if (first is not None and month < first.strftime('%Y-%m')) or (last is not None and month > last.strftime('%Y-%m')):
+            continue
+        for name in FORMATS.values():
+            if os.path.exists(os.path.join(base, entry, name)):
+                tables.append(_read_table(os.path.join(base, entry, name)))
+                break
+    if not tables:
+        return None
+    # Windows exported separately can hold different columns; missing ones read as nulls
+    table = pa.concat_tables(tables, promote_options='default')
+    # Rows are sorted, so the range is a zero-copy slice located on the timestamp column
+    timestamps = table.column(TIME_COLUMN).to_numpy()
+    i = 0 if first is None else int(np.searchsorted(timestamps, first.tz_convert(None).to_datetime64(), side='left'))
+    j = len(table) if last is None else int(np.searchsorted(timestamps, last.tz_convert(None).to_datetime64(), side='right'))
+    return table.slice(i, max(i, j) - i)
+
+def configuration_partitions(asset, leverage, borrow_asset):
+    return {'asset': asset, 'leverage': f'{leverage:g}', 'borrow_asset': borrow_asset}
+
+def export_window(df, root, start_date, end_date, initial_capital, asgard_open_fee, asgard_close_fee,
+                  assets=ASSETS, leverage_options=LEVERAGE_OPTIONS, borrow_assets=ASGARD_BORROW_ASSETS, format='arrow'):
+    """Export a loaded window: its rate history, every configuration's hourly fees and its fee grid."""
+    _require_arrow()
+    paths = export_series(df, root, 'rates', format=format)
+    schedules = FeeSchedules(df, window_keys(assets, borrow_assets))
+    for borrow_asset in borrow_assets:
+        exchanges = get_displayed_exchanges(borrow_asset)
+        for asset in assets:
+            for leverage in leverage_options:
+                hourly_fees = build_hourly_fees_df(schedules, exchanges, EXCHANGE_NAMES, asset, initial_capital * leverage,
+                                                   leverage, borrow_asset)
+                paths += export_series(hourly_fees, root, 'hourly_fees', configuration_partitions(asset, leverage, borrow_asset), format)
+    grid = compute_fee_grid(schedules, initial_capital, asgard_open_fee, asgard_close_fee,
+                            assets, leverage_options, borrow_assets, get_displayed_exchanges)
+    paths.append(export_table(grid, root, 'fee_grid', {'window': f'{start_date}_{end_date}'}, format))
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--start', required=True, help='first day of data (YYYY-MM-DD)')
+    parser.add_argument('--end', default=datetime.utcnow().strftime('%Y-%m-%d'), help='last day of data (YYYY-MM-DD, default today)')
+    parser.add_argument('--capital', type=float, default=10000.0, help='initial capital in USD')
+    parser.add_argument('--asgard-open-fee', type=float, default=0.06, help='Asgard opening fee in percent')
+    parser.add_argument('--asgard-close-fee', type=float, default=0.06, help='Asgard closing fee in percent')
+    parser.add_argument('--format', choices=list(FORMATS), default='arrow')
+    parser.add_argument('--db', default=HISTORY_DB_PATH, help='local history store')
+    parser.add_argument('--output', default=EXPORT_DIR, help='export root directory')
+    args = parser.parse_args(argv)
+    if not arrow_available():
+        log("Exports need pyarrow: pip install pyarrow")
+        return 1
+
+    df = load_cli_history(args.start, args.end, args.db)
+    if df is None:
+        return 1
+
+    started = time.perf_counter()
+    paths = export_window(df, args.output, args.start, args.end, args.capital,
+                          args.asgard_open_fee / 100, args.asgard_close_fee / 100, format=args.format)
+    log(f"Wrote {len(paths)} files under {args.output} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
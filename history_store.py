@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+HISTORY_DB_PATH = os.environ.get('FEE_HISTORY_DB', '.fee_history.sqlite3')
+DATE_FORMAT = '%Y-%m-%d'
+# Upstream writes one snapshot per hour; a day is only final once its last snapshot has landed.
+SETTLE_DELAY = timedelta(hours=2)
+# A settled day upstream returned nothing for is asked for again after this long, in case it is backfilled
+EMPTY_DAY_RETRY = timedelta(hours=1)
+READ_BATCH_SIZE = 4096
+# Sessions and background refreshes may write concurrently
+SQLITE_TIMEOUT = 30
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=SQLITE_TIMEOUT)
+    conn.execute('CREATE TABLE IF NOT EXISTS snapshots (created_at TEXT PRIMARY KEY, payload TEXT NOT NULL)')
+    # retry_after is NULL for days stored with snapshots, and when to fetch again for empty ones
+    conn.execute('CREATE TABLE IF NOT EXISTS fetched_days (day TEXT PRIMARY KEY, retry_after TEXT)')
+    if 'retry_after' not in {row[1] for row in conn.execute('PRAGMA table_info(fetched_days)')}:
+        with conn:
+            # Stores from before empty days were told apart: retry the days they hold no snapshots for
+            conn.execute('ALTER TABLE fetched_days ADD COLUMN retry_after TEXT')
+            conn.execute("UPDATE fetched_days SET retry_after = '' WHERE NOT EXISTS (SELECT 1 FROM snapshots "
+                         "WHERE created_at >= fetched_days.day AND created_at < date(fetched_days.day, '+1 day'))")
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'stored_columns'").fetchone():
+        with conn:
+            # The columns every stored day holds; '*' for stores of full payloads
+            conn.execute('CREATE TABLE stored_columns (name TEXT PRIMARY KEY)')
+            if conn.execute('SELECT 1 FROM snapshots LIMIT 1').fetchone():
+                conn.execute("INSERT INTO stored_columns (name) VALUES ('*')")
+    return conn
+
+def _require_columns(conn, columns):
+    """Record that the days fetched from now on hold `columns`.
+
+    Days stored with a set of columns that does not cover `columns` are fetched again.
+    """
+    stored = {row[0] for row in conn.execute('SELECT name FROM stored_columns')}
+    if stored == {'*'} or not stored.issuperset(columns):
+        with conn:
+            if stored != {'*'}:
+                conn.execute('DELETE FROM fetched_days')
+            conn.execute('DELETE FROM stored_columns')
+            conn.executemany('INSERT INTO stored_columns (name) VALUES (?)', ((column,) for column in columns))
+
+def _days(start_date, end_date):
+    day = datetime.strptime(start_date, DATE_FORMAT).date()
+    last = datetime.strptime(end_date, DATE_FORMAT).date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+def _settled_before():
+    """First day that may still receive snapshots upstream."""
+    return (datetime.utcnow() - SETTLE_DELAY).date()
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S')
+
+def missing_ranges(conn, start_date, end_date):
+    """Return the contiguous (from, to) day ranges of the window not yet stored locally.
+
+    Days upstream returned nothing for count as stored until their retry time passes.
+    """
+    fetched = {row[0] for row in conn.execute(
+        'SELECT day FROM fetched_days WHERE day BETWEEN ? AND ? AND (retry_after IS NULL OR retry_after > ?)',
+        (start_date, end_date, _timestamp(datetime.utcnow())))}
+    ranges = []
+    run_start = run_end = None
+    for day in _days(start_date, end_date):
+        day_str = day.strftime(DATE_FORMAT)
+        if day_str in fetched:
+            if run_start is not None:
+                ranges.append((run_start, run_end))
+                run_start = None
+            continue
+        if run_start is None:
+            run_start = day_str
+        run_end = day_str
+    if run_start is not None:
+        ranges.append((run_start, run_end))
+    return ranges
+
+def save_snapshots(conn, rows, start_date, end_date):
+    """Merge fetched rows into the store and mark the settled days of the range as fetched.
+
+    Settled days with snapshots are complete; settled days without any are only skipped
+    for EMPTY_DAY_RETRY, so a day upstream was missing when it was fetched is asked for again.
+    """
+    with conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO snapshots (created_at, payload) VALUES (?, ?)',
+            ((row['createdAt'], json.dumps(row)) for row in rows if 'createdAt' in row))
+        stored = {row[0] for row in conn.execute(
+            'SELECT DISTINCT substr(created_at, 1, 10) FROM snapshots WHERE created_at >= ? AND created_at < ?',
+            _window_bounds(start_date, end_date))}
+        settled_before = _settled_before()
+        retry_after = _timestamp(datetime.utcnow() + EMPTY_DAY_RETRY)
+        days = [day.strftime(DATE_FORMAT) for day in _days(start_date, end_date) if day < settled_before]
+        conn.executemany(
+            'INSERT OR REPLACE INTO fetched_days (day, retry_after) VALUES (?, ?)',
+            ((day, None if day in stored else retry_after) for day in days))
+
+def _window_bounds(start_date, end_date):
+    end_exclusive = (datetime.strptime(end_date, DATE_FORMAT) + timedelta(days=1)).strftime(DATE_FORMAT)
+    return start_date, end_exclusive
+
+def read_snapshots(conn, start_date, end_date):
+    """Return stored rows with createdAt in [start_date, end_date], oldest first."""
+    cursor = conn.execute(
+        'SELECT payload FROM snapshots WHERE created_at >= ? AND created_at < ? ORDER BY created_at',
+        _window_bounds(start_date, end_date))
+    return [json.loads(payload) for (payload,) in cursor]
+
+def read_frame(conn, start_date, end_date, columns):
+    """Return createdAt plus `columns` (dotted json_normalize names) for the window, oldest first.
+
+    Only the requested fields are extracted from the stored payloads, straight into a
+    preallocated float matrix. Columns with no value in the window are left out, matching
+    what pd.json_normalize would produce.
+    """
+    bounds = _window_bounds(start_date, end_date)
+    (n,) = conn.execute(
+        'SELECT COUNT(*) FROM snapshots WHERE created_at >= ? AND created_at < ?', bounds).fetchone()
+    created_at = np.empty(n, dtype=object)
+    values = np.full((n, len(columns)), np.nan)
+    extracts = ''.join(f", json_extract(payload, '$.{column}')" for column in columns)
+    cursor = conn.execute(
+        f'SELECT created_at{extracts} FROM snapshots WHERE created_at >= ? AND created_at < ? ORDER BY created_at',
+        bounds)
+    offset = 0
+    while offset < n:
+        batch = cursor.fetchmany(READ_BATCH_SIZE)
+        if not batch:
+            break
+        created_at[offset:offset + len(batch)] = [row[0] for row in batch]
+        if columns:
+            values[offset:offset + len(batch)] = [row[1:] for row in batch]
+        offset += len(batch)
+    present = ~np.isnan(values[:offset]).all(axis=0)
+    frame = pd.DataFrame(values[:offset, present], columns=[column for column, ok in zip(columns, present) if ok])
+    frame.insert(0, 'createdAt', created_at[:offset])
+    return frame
+
+def _fetch_missing(conn, start_date, end_date, fetch_ranges, metrics=None):
+    ranges = missing_ranges(conn, start_date, end_date)
+    if not ranges:
+        return
+    for range_start, range_end, rows in fetch_ranges(ranges):
+        if rows is not None:
+            with timed(metrics, 'Store snapshots', rows=len(rows)):
+                save_snapshots(conn, rows, range_start, range_end)
+
+def append_history(rows, start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Merge rows fetched for the day range [start_date, end_date] into the store."""
+    with closing(_connect(db_path)) as conn:
+        save_snapshots(conn, rows, start_date, end_date)
+
+def load_history(start_date, end_date, fetch_ranges, columns, db_path=HISTORY_DB_PATH, metrics=None):
+    """Serve a date window from the local store, fetching only the sub-ranges it is missing.
+
+    `fetch_ranges(ranges)` receives the missing inclusive (from, to) day ranges and must
+    yield (range_start, range_end, rows) for the pieces it fetched, with rows None for a
+    failed piece. Rows need only hold createdAt and `columns`; fetch_chunks(...,
+    columns=columns) cuts them down while parsing, so the store keeps only those fields.
+    Days stored for a set of columns that does not cover `columns` are fetched again.
+    Each piece is stored as soon as it arrives, so an interrupted fetch resumes where it
+    stopped and failed pieces are retried on the next call. Returns a DataFrame of
+    createdAt plus the requested `columns`; `metrics` receives the store and
+    frame-building stages.
+    """
+    with closing(_connect(db_path)) as conn:
+        _require_columns(conn, columns)
+        _fetch_missing(conn, start_date, end_date, fetch_ranges, metrics)
+        with timed(metrics, 'Build frame') as stage:
+            frame = read_frame(conn, start_date, end_date, columns)
+            stage['rows'] = len(frame)
+        return frame
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ijson
+except ImportError:  # Fall back to a full json.load of the body
+    ijson = None
+
+INITIAL_CAPACITY = 1024
+# What a malformed or truncated body raises while it is parsed
+PARSE_ERRORS = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+
+def iter_snapshots(fp):
+    """Yield the rows of a JSON array of snapshots, parsing `fp` incrementally when ijson is installed."""
+    if ijson is None:
+        yield from json.load(fp)
+        return
+    yield from ijson.items(fp, 'item', use_float=True)
+
+def _lookup(row, path):
+    for key in path:
+        if not isinstance(row, dict):
+            return None
+        row = row.get(key)
+    return row
+
+def column_paths(columns):
+    """Key paths of dotted json_normalize column names."""
+    return [tuple(column.split('.')) for column in columns]
+
+def project_snapshot(row, paths):
+    """A copy of a snapshot row holding only createdAt and the fields at `paths` it has.
+
+    The copy keeps the nesting, so pd.json_normalize and JSON path lookups see the same
+    column names as on the full row.
+    """
+    projected = {'createdAt': row['createdAt']} if 'createdAt' in row else {}
+    for path in paths:
+        value = _lookup(row, path)
+        if value is None or isinstance(value, (dict, list)):
+            continue
+        node = projected
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return projected
+
+def snapshots_to_frame(rows, columns, capacity=INITIAL_CAPACITY):
+    """Project an iterable of snapshot rows onto `columns` (dotted json_normalize names).
+
+    Values are written straight into preallocated float arrays, grown by doubling, so only
+    one row is held as Python objects at a time. Columns that never appear in the rows are
+    left out of the result, matching what pd.json_normalize would produce.
+    """
+    paths = column_paths(columns)
+    created_at = np.empty(capacity, dtype=object)
+    values = np.full((capacity, len(columns)), np.nan)
+    seen = np.zeros(len(columns), dtype=bool)
+    n = 0
+    for row in rows:
+        if n == len(created_at):
+            created_at = np.concatenate([created_at, np.empty(n, dtype=object)])
+            values = np.concatenate([values, np.full((n, len(columns)), np.nan)])
+        created_at[n] = row.get('createdAt')
+        for j, path in enumerate(paths):
+            value = _lookup(row, path)
+            if value is not None:
+                values[n, j] = value
+                seen[j] = True
+        n += 1
+    frame = pd.DataFrame(values[:n, seen], columns=[column for column, ok in zip(columns, seen) if ok])
+    frame.insert(0, 'createdAt', created_at[:n])
+    return frame
@@ -0,0 +1,172 @@
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+PIPELINE_LOG_PATH = os.environ.get('FEE_PIPELINE_LOG', '.pipeline_timings.jsonl')
+PIPELINE_METRICS_PATH = os.environ.get('FEE_PIPELINE_METRICS', '.pipeline_metrics.prom')
+METRIC_PREFIX = 'fee_pipeline'
+PROFILE_LINES = 60
+
+logger = logging.getLogger(__name__)
+
+class PipelineMetrics:
+    """Wall time, rows and bytes of every pipeline stage of one dashboard run.
+
+    Stages recorded under the same name (one per fetched chunk, say) are added up, so
+    their seconds can exceed the run's wall time when they ran in parallel. Worker
+    threads may record concurrently.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, rows=0, nbytes=0):
+        with self._lock:
+            stage = self._stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0})
+            stage['calls'] += 1
+            stage['seconds'] += seconds
+            stage['rows'] += rows
+            stage['bytes'] += nbytes
+
+    @contextmanager
+    def stage(self, name, rows=0, nbytes=0):
+        """Time the block as stage `name`; 'rows' and 'bytes' of the yielded dict may be set inside it."""
+        counts = {'rows': rows, 'bytes': nbytes}
+        started = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add(name, time.perf_counter() - started, counts['rows'], counts['bytes'])
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def stages(self):
+        with self._lock:
+            return {name: dict(stage) for name, stage in self._stages.items()}
+
+    def frame(self):
+        """Stages in the order they were first recorded, for display."""
+        frame = pd.DataFrame.from_dict(self.stages(), orient='index', columns=['calls', 'seconds', 'rows', 'bytes'])
+        frame.columns = ['Calls', 'Seconds', 'Rows', 'Bytes']
+        frame.index.name = 'Stage'
+        return frame
+
+    def record(self):
+        """The run as one JSON-serializable record."""
+        return {
+            'started_at': self.started_at.isoformat(),
+            'total_seconds': self.elapsed(),
+            'stages': [dict(stage, stage=name) for name, stage in self.stages().items()],
+        }
+
+@contextmanager
+def _untimed(rows, nbytes):
+    yield {'rows': rows, 'bytes': nbytes}
+
+def timed(metrics, name, rows=0, nbytes=0):
+    """metrics.stage(name, ...), or a block that records nothing when metrics is None."""
+    return metrics.stage(name, rows, nbytes) if metrics is not None else _untimed(rows, nbytes)
+
+def append_json_log(metrics, path=PIPELINE_LOG_PATH):
+    """Append the run to a JSON-lines log, one record per run."""
+    with open(path, 'a') as log:
+        log.write(json.dumps(metrics.record()) + '\n')
+
+_totals = {}
+_runs = 0
+_totals_lock = threading.Lock()
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(metrics):
+    """Last-run gauges plus process-lifetime counters in the Prometheus text exposition format.
+
+    Counters accumulate over every run passed here since the process started.
+    """
+    global _runs
+    stages = metrics.stages()
+    with _totals_lock:
+        _runs += 1
+        for name, stage in stages.items():
+            totals = _totals.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0})
+            for field in totals:
+                totals[field] += stage[field]
+        totals = {name: dict(stage) for name, stage in _totals.items()}
+        runs = _runs
+
+    lines = [
+        f'# HELP {METRIC_PREFIX}_run_seconds Wall time of the last dashboard run.',
+        f'# TYPE {METRIC_PREFIX}_run_seconds gauge',
+        f'{METRIC_PREFIX}_run_seconds {metrics.elapsed():.6f}',
+        f'# HELP {METRIC_PREFIX}_runs_total Dashboard runs since the process started.',
+        f'# TYPE {METRIC_PREFIX}_runs_total counter',
+        f'{METRIC_PREFIX}_runs_total {runs}',
+    ]
+    for field, unit, values, kind in [
+        ('seconds', 'seconds', stages, 'gauge'), ('rows', 'rows', stages, 'gauge'), ('bytes', 'bytes', stages, 'gauge'),
+        ('seconds', 'seconds_total', totals, 'counter'), ('rows', 'rows_total', totals, 'counter'),
+        ('bytes', 'bytes_total', totals, 'counter'), ('calls', 'calls_total', totals, 'counter'),
+    ]:
+        metric = f'{METRIC_PREFIX}_stage_{unit}'
+        scope = 'since the process started' if kind == 'counter' else 'in the last run'
+        lines.append(f'# HELP {metric} Stage {field} {scope}.')
+        lines.append(f'# TYPE {metric} {kind}')
+        lines.extend(f'{metric}{{stage="{_label(name)}"}} {stage[field]:g}' for name, stage in values.items())
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(metrics, path=PIPELINE_METRICS_PATH):
+    """Write prometheus_text to `path` atomically, e.g. for a node_exporter textfile collector.
+
+    Every call writes its own temporary file, so concurrent sessions never rename each
+    other's; the last replace wins.
+    """
+    text = prometheus_text(metrics)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.prometheus-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as out:
+            out.write(text)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+def export_run(metrics, log_path=PIPELINE_LOG_PATH, metrics_path=PIPELINE_METRICS_PATH):
+    """Append the run to the JSON log and write the Prometheus file; failures are logged, not raised."""
+    try:
+        append_json_log(metrics, log_path)
+        write_prometheus(metrics, metrics_path)
+    except OSError as error:
+        logger.warning("Could not export pipeline metrics: %s", error)
+
+def start_profiler():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def profile_report(profiler, sort='cumulative', limit=PROFILE_LINES):
+    """Text report of the `limit` most expensive functions of a stopped profiler."""
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def profile_dump(profiler):
+    """Raw stats of a stopped profiler, in the .prof format read by pstats and snakeviz."""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
@@ -0,0 +1,133 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fetcher import fetch_chunk
+from history_store import HISTORY_DB_PATH, append_history
+from ingest import snapshots_to_frame
+
+MIN_CAPACITY = 256
+
+def venue_rate_matrix(df, venue_terms):
+    """Hourly rate (% per hour) of every venue as an (hours x venues) matrix.
+
+    `venue_terms` maps a venue to its prefix_index.rate_terms; a missing value in any term
+    makes that hour missing, as in calculate_exchange_fees.
+    """
+    rates = np.zeros((len(df), len(venue_terms)))
+    for j, terms in enumerate(venue_terms.values()):
+        for column, weight in terms:
+            rates[:, j] += weight * (df[column].to_numpy(dtype=float) if column in df else np.nan)
+    return rates
+
+def poll_new_rows(url, last_created_at, columns, db_path=HISTORY_DB_PATH):
+    """Fetch only the days from the last known snapshot onwards and return the newer rows.
+
+    Everything fetched, cut down to `columns`, is also merged into the history store. Returns a frame of createdAt
+    plus `columns`, or None if the request failed.
+    """
+    start_day = last_created_at[:10]
+    end_day = datetime.utcnow().strftime('%Y-%m-%d')
+    rows = fetch_chunk(url, start_day, end_day, columns=columns)
+    if rows is None:
+        return None
+    append_history(rows, start_day, end_day, db_path)
+    new_rows = sorted((row for row in rows if row['createdAt'] > last_created_at), key=lambda row: row['createdAt'])
+    return snapshots_to_frame(new_rows, columns)
+
+class LiveWindow:
+    """Columnar time window of hourly series that is updated in place.
+
+    Rows are appended at the back and evicted from the front once they are older than
+    `window`. Running sums, sums of squares and counts, and the cumulative sum of every
+    series are maintained per appended or evicted row, so an update costs O(new rows)
+    (plus an occasional amortized compaction of the buffers). Cumulative sums are
+    anchored at the first row ever appended, so rows already drawn never change.
+    """
+
+    def __init__(self, names, window):
+        self.names = list(names)
+        self.window = np.timedelta64(pd.Timedelta(window))
+        self.last_created_at = None
+        self._timestamps = np.empty(MIN_CAPACITY, dtype='datetime64[ns]')
+        self._values = np.empty((MIN_CAPACITY, len(self.names)))
+        self._cumulative = np.empty((MIN_CAPACITY, len(self.names)))
+        self._start = self._end = 0
+        self._sums = np.zeros(len(self.names))
+        self._sums_of_squares = np.zeros(len(self.names))
+        self._counts = np.zeros(len(self.names), dtype=np.int64)
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _reserve(self, n_new):
+        if self._end + n_new <= len(self._timestamps):
+            return
+        n_live = len(self)
+        capacity = max(MIN_CAPACITY, 2 * (n_live + n_new))
+        for name in ['_timestamps', '_values', '_cumulative']:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:n_live] = old[self._start:self._end]
+            setattr(self, name, new)
+        self._start, self._end = 0, n_live
+
+    def append(self, created_at, values):
+        """Append rows (createdAt strings, values matrix) newer than the last one.
+
+        Returns the appended rows as (rates, cumulative) frames indexed by timestamp.
+        """
+        created_at = np.asarray(created_at, dtype=object)
+        values = np.asarray(values, dtype=float).reshape(len(created_at), len(self.names))
+        if self.last_created_at is not None:
+            newer = created_at > self.last_created_at
+            created_at, values = created_at[newer], values[newer]
+        n_new = len(created_at)
+        if n_new:
+            self._reserve(n_new)
+            timestamps = pd.to_datetime(created_at, utc=True).tz_convert(None).to_numpy()
+            observed = ~np.isnan(values)
+            filled = np.where(observed, values, 0.0)
+            previous = self._cumulative[self._end - 1] if len(self) else np.zeros(len(self.names))
+            rows = slice(self._end, self._end + n_new)
+            self._timestamps[rows] = timestamps
+            self._values[rows] = values
+            self._cumulative[rows] = previous + np.cumsum(filled, axis=0)
+            self._end += n_new
+            self._sums += filled.sum(axis=0)
+            self._sums_of_squares += (filled ** 2).sum(axis=0)
+            self._counts += observed.sum(axis=0)
+            self.last_created_at = created_at[-1]
+            self._evict()
+        return self._frame(self._end - n_new)
+
+    def _evict(self):
+        cutoff = self._timestamps[self._end - 1] - self.window
+        n_old = int(np.searchsorted(self._timestamps[self._start:self._end], cutoff, side='left'))
+        if not n_old:
+            return
+        old = self._values[self._start:self._start + n_old]
+        observed = ~np.isnan(old)
+        filled = np.where(observed, old, 0.0)
+        self._sums -= filled.sum(axis=0)
+        self._sums_of_squares -= (filled ** 2).sum(axis=0)
+        self._counts -= observed.sum(axis=0)
+        self._start += n_old
+
+    def frame(self):
+        """Return the (rates, cumulative) frames of the whole window."""
+        return self._frame(self._start)
+
+    def _frame(self, start):
+        start = max(start, self._start)
+        index = pd.DatetimeIndex(self._timestamps[start:self._end])
+        return (pd.DataFrame(self._values[start:self._end], index=index, columns=self.names),
+                pd.DataFrame(self._cumulative[start:self._end], index=index, columns=self.names))
+
+    def stats(self):
+        """Running mean, standard deviation, total and row count of every series in the window."""
+        counts = np.maximum(self._counts, 1)
+        mean = self._sums / counts
+        std = np.sqrt(np.maximum(self._sums_of_squares / counts - mean ** 2, 0.0))
+        return pd.DataFrame({'Average': mean, 'Std Dev': std, 'Total': self._sums, 'Hours': self._counts}, index=self.names)
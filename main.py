@@ -1,15 +1,23 @@
 import streamlit as st
-import requests
 import json
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from cache_warmer import get_warmer
+from fee_matrix import (
+    LEVERAGE_MAX, LEVERAGE_MIN, LEVERAGE_STEP, axis_slice, cheapest_venue, fee_matrix, horizon_grid, horizon_label,
+    leverage_grid, venue_annual_rates,
+)
+from shared_service import METADATA_URL, get_service
 
 st.title("Comparison Meta Data")
 
-# Fetch data from the endpoint
-url = "https://perp-fee-comparison.0xdeepmehta.workers.dev/"
-response = requests.get(url)
-data = response.json()
+# Fetch data from the endpoint, shared by every session through the aggregation service
+get_warmer()
+data = get_service().get_metadata(METADATA_URL)
 
-# Extract data
+# Extract data (the metadata payload is fetched once per refresh, so slider moves never refetch it)
 marginfi = data['marginfi']
 jupPerp = data['jupPerp']
 flashPerp = data['flashPerp']
@@ -47,41 +55,78 @@ st.write(f"Initial Margin: ${initial_margin_usd:.2f}")
 initial_margin_sol = initial_margin_usd / sol_price_usd
 st.write(f"Initial Margin in SOL: {initial_margin_sol:.6f} SOL")
 
+# Compounding charges each hour's fee on the borrowed balance carried forward
+compounding = st.toggle("Compound borrow fees hourly")
+
 # Leverage levels
 leverage_levels = [2, 5, 10, 15, 20, 50, 100]
 
 # Time periods in days
 time_periods = [1, 7, 15]
 
-# Function to calculate fees
-def calculate_fees(initial_margin, leverage, annual_rate, days):
-    borrowed_amount = initial_margin * (leverage - 1)
-    daily_rate = annual_rate / 365
-    fee = borrowed_amount * daily_rate * days
-    return fee
-
 # Display fees for Marginfi, JUP PERP, and FLASH PERP
-for perp_name, annual_rate in [("Marginfi", abs(marginfi['netApy'] * 100)), 
-                               ("JUP PERP", jupPerp['jupAnnualRate']), 
-                               ("FLASH PERP", flashPerp['flashAnnualRate'])]:
+# All venues, leverage levels and periods are computed in one broadcast; only the cells shown are formatted
+annual_rates = venue_annual_rates(data)
+table_fees = fee_matrix(initial_margin_usd, list(annual_rates.values()), leverage_levels, [days * 24 for days in time_periods], compounding)
+for venue_fees, (perp_name, annual_rate) in zip(table_fees, annual_rates.items()):
     st.header(f"{perp_name} (APR: {annual_rate:.2f}%)")
     
     # Create a table for each perp
     table_data = []
-    for leverage in leverage_levels:
+    for leverage, fees_usd in zip(leverage_levels, venue_fees):
         notional_size_usd = initial_margin_usd * leverage
         notional_size_sol = initial_margin_sol * leverage
         row = [
             f"{leverage}x",
             f"${notional_size_usd:.2f} ({notional_size_sol:.6f} SOL)"
         ]
-        for days in time_periods:
-            fee_sol = calculate_fees(initial_margin_sol, leverage, annual_rate / 100, days)
-            fee_usd = fee_sol * sol_price_usd
-            row.append(f"${fee_usd:.2f} ({fee_sol:.6f} SOL)")
+        row.extend(f"${fee_usd:.2f} ({fee_usd / sol_price_usd:.6f} SOL)" for fee_usd in fees_usd)
         table_data.append(row)
     
     # Display the table
     st.table([["Leverage", "Notional Size", "1 Day", "7 Days", "15 Days"]] + table_data)
 
-st.info("Note: These calculations assume a constant borrow rate and do not account for potential rate changes or compounding effects.")
\ No newline at end of file
+# Fee matrix over a continuous leverage range and horizons from 1 hour to a year
+st.header("Fee Matrix")
+leverages = leverage_grid()
+horizons = horizon_grid()
+matrix = fee_matrix(initial_margin_usd, list(annual_rates.values()), leverages, horizons, compounding)
+st.write(f"{matrix.size:,} fee cells: {len(annual_rates)} venues × {len(leverages)} leverage levels × {len(horizons)} horizons")
+
+leverage_range = st.slider("Leverage range", min_value=LEVERAGE_MIN, max_value=LEVERAGE_MAX,
+                           value=(LEVERAGE_MIN, LEVERAGE_MAX), step=LEVERAGE_STEP, format="%.1fx")
+horizon_labels = [horizon_label(hours) for hours in horizons]
+horizon_range = st.select_slider("Horizon range", options=horizon_labels, value=(horizon_labels[0], horizon_labels[-1]))
+heatmap_venue = st.selectbox("Heatmap venue", list(annual_rates))
+
+# Only the visible slice, thinned to at most MAX_AXIS_CELLS per axis, is turned into chart data
+rows = axis_slice(leverages, *leverage_range)
+cols = axis_slice(horizons, horizons[horizon_labels.index(horizon_range[0])], horizons[horizon_labels.index(horizon_range[1])])
+visible = matrix[np.ix_(np.arange(len(annual_rates)), rows, cols)]
+leverage_axis = [f"{leverage:.1f}x" for leverage in leverages[rows]]
+horizon_axis = [horizon_labels[col] for col in cols]
+cells = pd.DataFrame({
+    'Leverage': np.repeat(leverage_axis, len(cols)),
+    'Horizon': np.tile(horizon_axis, len(rows)),
+    'Fee (USD)': visible[list(annual_rates).index(heatmap_venue)].ravel(),
+    'Cheapest Venue': np.array(list(annual_rates))[cheapest_venue(visible)].ravel(),
+})
+x_axis = alt.X('Horizon:O', sort=horizon_axis)
+y_axis = alt.Y('Leverage:O', sort=leverage_axis[::-1])
+
+st.subheader(f"{heatmap_venue} Fee Heatmap")
+st.altair_chart(alt.Chart(cells).mark_rect().encode(
+    x=x_axis, y=y_axis,
+    color=alt.Color('Fee (USD):Q', scale=alt.Scale(scheme='viridis')),
+    tooltip=['Leverage', 'Horizon', alt.Tooltip('Fee (USD):Q', format='$,.2f')],
+), width='stretch')
+
+st.subheader("Cheapest Venue")
+st.altair_chart(alt.Chart(cells).mark_rect().encode(
+    x=x_axis, y=y_axis,
+    color='Cheapest Venue:N',
+    tooltip=['Leverage', 'Horizon', 'Cheapest Venue'],
+), width='stretch')
+
+st.info("Note: These calculations assume a constant borrow rate and do not account for potential rate changes"
+        + ("." if compounding else " or compounding effects."))
\ No newline at end of file
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fee_engine import EXCHANGE_NAMES, compounded_fees, get_displayed_exchanges
+from shared_service import cached_venue_fees
+
+COMPARISON_COLUMNS = ['asset', 'borrow_asset', 'exchange', 'open_fee', 'variable_fee', 'close_fee', 'total_fee']
+
+def compare_configuration(window, asset, borrow_asset, leverage, asgard_open_fee, asgard_close_fee, initial_capital,
+                          compounding=False):
+    """The dashboard's fee pipeline for one asset and borrow asset of a loaded window.
+
+    Returns tidy fee rows for the venues with data and their cumulative hourly variable
+    fees as an (hours x venues) array. The fees come from the shared fee cache when
+    another session (or the cache warmer) already computed them. With `compounding`, the
+    variable fees accrue on the balance carried forward, as in compute_fee_grid.
+    """
+    position_size = initial_capital * leverage
+    fees = cached_venue_fees(window, asset, leverage, borrow_asset, asgard_open_fee, asgard_close_fee, initial_capital)
+    exchanges = [ex for ex in get_displayed_exchanges(borrow_asset) if fees[ex][5]]
+    rates = np.column_stack([fees[ex][4].to_numpy(dtype=float) for ex in exchanges]) if exchanges else np.zeros((len(window.df), 0))
+    if not compounding:
+        rows = [(asset, borrow_asset, ex) + tuple(fees[ex][:4]) for ex in exchanges]
+        return rows, exchanges, np.nancumsum(rates, axis=0) / 100 * position_size
+    cumulative = compounded_fees(np.nan_to_num(rates), position_size)
+    variable_fees = cumulative[-1] if len(cumulative) else np.zeros(len(exchanges))
+    rows = [(asset, borrow_asset, ex, fees[ex][0], variable_fees[i], fees[ex][2], fees[ex][0] + variable_fees[i] + fees[ex][2])
+            for i, ex in enumerate(exchanges)]
+    return rows, exchanges, cumulative
+
+def compare_assets(window, assets, borrow_assets, leverage, asgard_open_fee, asgard_close_fee, initial_capital,
+                   compounding=False, workers=None):
+    """Run compare_configuration for every asset x borrow asset concurrently over one shared window.
+
+    The configurations only select keys from the window's compiled fee schedules and
+    spend their time in NumPy, which releases the GIL, so a thread pool runs them side by side without copying the data
+    into worker processes. Timestamps come from the window's prefix-sum index, parsed
+    once when the window was loaded. Returns a tidy frame with the columns in
+    COMPARISON_COLUMNS and the cumulative variable fees of every (asset, venue) as one
+    frame, with columns labelled "ASSET · Venue" (plus the borrow asset when several
+    are compared).
+    """
+    configs = [(asset, borrow_asset) for borrow_asset in borrow_assets for asset in assets]
+    with ThreadPoolExecutor(max_workers=workers or len(configs)) as executor:
+        results = list(executor.map(
+            lambda config: compare_configuration(window, *config, leverage, asgard_open_fee, asgard_close_fee, initial_capital,
+                                                 compounding),
+            configs))
+    table = pd.DataFrame([row for rows, _, _ in results for row in rows], columns=COMPARISON_COLUMNS)
+    labels = []
+    for (asset, borrow_asset), (_, exchanges, _) in zip(configs, results):
+        prefix = f"{asset} ({borrow_asset})" if len(borrow_assets) > 1 else asset
+        labels += [f"{prefix} · {EXCHANGE_NAMES[ex]}" for ex in exchanges]
+    cumulative = pd.DataFrame(np.hstack([fees for _, _, fees in results]), columns=labels,
+                              index=pd.DatetimeIndex(window.rate_index.timestamps))
+    return table, cumulative
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from fee_engine import FEE_SCHEDULES, hourly_rate_scale, rate_columns
+
+def rate_terms(exchange, asset, leverage, borrow_asset):
+    """Express a venue's hourly rate (% per hour) as a weighted sum of raw data columns.
+
+    Returns a list of (column, weight), following the venue's FEE_SCHEDULES entry: rate
+    columns are scaled to hourly %, and a levered borrow pays borrow - borrow / leverage.
+    """
+    schedule = FEE_SCHEDULES[exchange]
+    borrow_column, deposit_column = rate_columns(exchange, asset, borrow_asset)
+    scale = hourly_rate_scale(exchange)
+    borrow_weight = (1 - 1 / leverage) * scale if schedule.levered_borrow else scale
+    if deposit_column is None:
+        return [(borrow_column, borrow_weight)]
+    return [(borrow_column, borrow_weight), (deposit_column, -scale)]
+
+class PrefixSumIndex:
+    """Running sums of the rate columns of a dataset, built once per group of columns.
+
+    Any [t0, t1] window sum is then the difference of two rows, so window fees, average
+    rates and cumulative series never re-scan the data. A venue's rate is missing in any
+    hour where one of its columns is, as in calculate_exchange_fees: each group of columns
+    a rate is built from gets its own sums over the rows where all of them are observed.
+    Such hours count as zero in sums and are excluded from averages.
+    """
+
+    def __init__(self, df):
+        self.timestamps = pd.to_datetime(df['createdAt'], utc=True).dt.tz_convert(None).to_numpy()
+        self.columns = [column for column in df.columns if column != 'createdAt']
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+        self._values = df[self.columns].to_numpy(dtype=float)
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def locate(self, t0=None, t1=None):
+        """Return the row slice bounds (i, j) of the window t0 <= createdAt <= t1."""
+        i = 0 if t0 is None else int(np.searchsorted(self.timestamps, np.datetime64(t0), side='left'))
+        j = len(self) if t1 is None else int(np.searchsorted(self.timestamps, np.datetime64(t1), side='right'))
+        return i, max(i, j)
+
+    def has_columns(self, terms):
+        return all(column in self._column_index for column, _ in terms)
+
+    def _group(self, terms):
+        """Prefix sums of the terms' columns over their jointly observed rows, and those rows' running count.
+
+        Built on first use and shared by every later query (and session) on the index.
+        """
+        columns = tuple(column for column, _ in terms)
+        with self._lock:
+            group = self._groups.get(columns)
+            if group is None:
+                values = self._values[:, [self._column_index[column] for column in columns]]
+                observed = ~np.isnan(values).any(axis=1)
+                sums = np.zeros((len(values) + 1, len(columns)))
+                np.cumsum(np.where(observed[:, None], values, 0.0), axis=0, out=sums[1:])
+                counts = np.zeros(len(values) + 1, dtype=np.int64)
+                np.cumsum(observed, out=counts[1:])
+                group = self._groups[columns] = (sums, counts)
+        return group
+
+    def window_sum(self, terms, i, j):
+        """Sum of the weighted rate series over rows [i, j)."""
+        sums, _ = self._group(terms)
+        return sum(weight * (sums[j, k] - sums[i, k]) for k, (_, weight) in enumerate(terms))
+
+    def window_mean(self, terms, i, j):
+        """Average of the weighted rate series over the observed rows of [i, j)."""
+        _, counts = self._group(terms)
+        count = counts[j] - counts[i]
+        return self.window_sum(terms, i, j) / count if count else np.nan
+
+    def cumulative(self, terms, i, j):
+        """Running sum of the weighted rate series from row i, for every row in [i, j)."""
+        sums, _ = self._group(terms)
+        result = np.zeros(j - i)
+        for k, (_, weight) in enumerate(terms):
+            result += weight * (sums[i + 1:j + 1, k] - sums[i, k])
+        return result
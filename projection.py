@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+PROJECTION_PATHS = 20000
+BLOCK_HOURS = 24
+CHUNK_PATHS = 1000
+PERCENTILES = [5, 50, 95]
+
+_worker_prefix = None
+
+def _init_worker(prefix):
+    global _worker_prefix
+    _worker_prefix = prefix
+
+def rate_prefix_sums(rates):
+    """Running sums of hourly rates (hours x venues) with a leading zero row; missing hours count as zero."""
+    rates = np.asarray(rates, dtype=float)
+    return np.vstack([np.zeros((1, rates.shape[1])), np.nancumsum(rates, axis=0)])
+
+def simulate_chunk(prefix, horizon_hours, block_hours, n_paths, seed):
+    """Summed rates of n_paths resampled paths of horizon_hours, as an (n_paths x venues) array.
+
+    Each path is built from blocks of block_hours consecutive historical hours (the last one
+    shortened to fit), drawn at random start hours; every venue uses the same blocks so
+    cross-venue correlation is kept as well. Block totals are differences of the prefix
+    sums, so a path costs one lookup per block rather than one per hour.
+    """
+    rng = np.random.default_rng(seed)
+    n_hours = len(prefix) - 1
+    block_hours = min(block_hours, n_hours)
+    n_blocks, remainder = divmod(horizon_hours, block_hours)
+    starts = rng.integers(0, n_hours - block_hours + 1, size=(n_paths, n_blocks))
+    totals = (prefix[starts + block_hours] - prefix[starts]).sum(axis=1)
+    if remainder:
+        starts = rng.integers(0, n_hours - remainder + 1, size=n_paths)
+        totals += prefix[starts + remainder] - prefix[starts]
+    return totals
+
+def _simulate_task(args):
+    return simulate_chunk(_worker_prefix, *args)
+
+def simulate_rate_totals(rates, horizon_hours, n_paths=PROJECTION_PATHS, block_hours=BLOCK_HOURS,
+                         seed=None, chunk_paths=CHUNK_PATHS, workers=None):
+    """Block-bootstrap summed hourly rates (%) over horizon_hours for every venue.
+
+    `rates` is an (hours x venues) history. Paths are simulated in chunks of chunk_paths so
+    memory stays bounded, optionally across `workers` processes. Every chunk has its own
+    seed spawned from `seed`, so results do not depend on chunking order or worker count.
+    Returns an (n_paths x venues) array.
+    """
+    prefix = rate_prefix_sums(rates)
+    if len(prefix) == 1 or not n_paths:
+        return np.zeros((n_paths, prefix.shape[1]))
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(horizon_hours, block_hours, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    if not workers or workers == 1:
+        parts = [simulate_chunk(prefix, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prefix,)) as executor:
+            parts = list(executor.map(_simulate_task, tasks))
+    return np.concatenate(parts)
+
+def project_fees(rates, venues, position_size, open_fees, close_fees, horizon_hours, n_paths=PROJECTION_PATHS,
+                 block_hours=BLOCK_HOURS, seed=None, chunk_paths=CHUNK_PATHS, workers=None):
+    """P5/P50/P95 (and mean) of total fees for holding each venue for the next horizon_hours.
+
+    Total fees are the open and close fees plus position_size * summed rate / 100, as in
+    calculate_exchange_fees. Returns a frame indexed by venue.
+    """
+    totals = simulate_rate_totals(rates, horizon_hours, n_paths, block_hours, seed, chunk_paths, workers)
+    fees = np.asarray(open_fees) + np.asarray(close_fees) + totals / 100 * position_size
+    projection = pd.DataFrame(np.percentile(fees, PERCENTILES, axis=0).T, index=venues,
+                              columns=[f'P{percentile}' for percentile in PERCENTILES])
+    projection['Mean'] = fees.mean(axis=0)
+    return projection
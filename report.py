@@ -0,0 +1,121 @@
+"""Headless fee reports for every asset, leverage, borrow asset and time horizon.
+
+Loads the longest horizon once through the local history store, spreads the
+(horizon, asset) grid across a process pool and writes one tidy table:
+
+    python report.py --horizons 1d 7d 30d 90d 365d --output reports/fees.parquet
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from cli import load_cli_history, log
+from fee_engine import (
+    ASGARD_BORROW_ASSETS, ASSETS, LEVERAGE_OPTIONS, FeeSchedules, compute_fee_grid,
+    get_displayed_exchanges, window_keys,
+)
+from history_store import HISTORY_DB_PATH
+
+HORIZONS = {
+    '1d': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+    '90d': timedelta(days=90),
+    '180d': timedelta(days=180),
+    '365d': timedelta(days=365),
+}
+
+_worker_df = None
+
+def _init_worker(df):
+    global _worker_df
+    _worker_df = df
+
+def horizon_window(df, end, horizon):
+    """Rows of df created in the `horizon` before `end`."""
+    cutoff = (end - HORIZONS[horizon]).strftime('%Y-%m-%dT%H:%M:%S')
+    return df[df['createdAt'] >= cutoff].reset_index(drop=True)
+
+def report_rows(df, end, horizon, asset, initial_capital, asgard_open_fee, asgard_close_fee):
+    """Fee grid plus hourly variable fee statistics for one horizon and asset.
+
+    The statistics of every grid row come from one (hours x keys x leverages) rate array
+    of the compiled schedules; hours with a missing value are left out, as in the fee grid.
+    """
+    window = horizon_window(df, end, horizon)
+    schedules = FeeSchedules(window, window_keys([asset], ASGARD_BORROW_ASSETS))
+    grid = compute_fee_grid(schedules, initial_capital, asgard_open_fee, asgard_close_fee,
+                            [asset], LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges)
+    # Grid rows run over its keys with the leverages innermost, as the rates' last two axes
+    keys = list(dict.fromkeys(zip(grid['exchange'], grid['asset'], grid['borrow_asset'])))
+    compiled = schedules.select(keys)
+    leverage = np.asarray(LEVERAGE_OPTIONS, dtype=float)
+    hourly_fees = compiled.hourly_rates(leverage) / 100 * initial_capital * leverage
+    hourly_fees[:, ~compiled.available] = 0
+    hourly_fees = hourly_fees.reshape(len(window), len(grid))
+    observed = (~np.isnan(hourly_fees)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(hourly_fees, axis=0) / observed
+        std = np.sqrt(np.nansum((hourly_fees - mean) ** 2, axis=0) / observed)
+    grid.insert(0, 'horizon', horizon)
+    grid.insert(1, 'hours', len(window))
+    return grid.assign(mean_hourly_fee=mean, std_hourly_fee=std, max_hourly_fee=np.fmax.reduce(hourly_fees, axis=0, initial=np.nan))
+
+def _report_task(args):
+    return report_rows(_worker_df, *args)
+
+def build_report(df, end, horizons, initial_capital, asgard_open_fee, asgard_close_fee, workers=None):
+    """Compute the report for every (horizon, asset) pair across a process pool."""
+    tasks = [(end, horizon, asset, initial_capital, asgard_open_fee, asgard_close_fee)
+             for horizon in horizons for asset in ASSETS]
+    if workers == 1:
+        parts = [report_rows(df, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df,)) as executor:
+            parts = list(executor.map(_report_task, tasks))
+    return pd.concat(parts, ignore_index=True)
+
+def write_report(report, path):
+    """Write the report as Parquet or CSV, chosen by the file extension."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith('.parquet'):
+        report.to_parquet(path, index=False)
+    else:
+        report.to_csv(path, index=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--end', default=datetime.utcnow().strftime('%Y-%m-%d'), help='last day of data (YYYY-MM-DD, default today)')
+    parser.add_argument('--horizons', nargs='+', choices=list(HORIZONS), default=list(HORIZONS))
+    parser.add_argument('--capital', type=float, default=10000.0, help='initial capital in USD')
+    parser.add_argument('--asgard-open-fee', type=float, default=0.06, help='Asgard opening fee in percent')
+    parser.add_argument('--asgard-close-fee', type=float, default=0.06, help='Asgard closing fee in percent')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--db', default=HISTORY_DB_PATH, help='local history store')
+    parser.add_argument('--output', default='fee_report.csv', help='.csv or .parquet output path')
+    args = parser.parse_args(argv)
+
+    end = datetime.strptime(args.end, '%Y-%m-%d') + timedelta(days=1)
+    start = end - max(HORIZONS[horizon] for horizon in args.horizons)
+
+    df = load_cli_history(start.strftime('%Y-%m-%d'), args.end, args.db)
+    if df is None:
+        return 1
+
+    # Horizons end at the latest snapshot, not at midnight after --end
+    end = min(end, datetime.strptime(df['createdAt'].iloc[-1][:19], '%Y-%m-%dT%H:%M:%S') + timedelta(hours=1))
+    started = time.perf_counter()
+    report = build_report(df, end, args.horizons, args.capital, args.asgard_open_fee / 100, args.asgard_close_fee / 100, args.workers)
+    log(f"Computed {len(report)} report rows in {time.perf_counter() - started:.2f}s")
+    write_report(report, args.output)
+    log(f"Wrote {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOWS = {'24h': 24, '7d': 7 * 24, '30d': 30 * 24}
+QUANTILES = [0.1, 0.5, 0.9]
+
+def window_starts(timestamps, hours):
+    """First row of the trailing window (t - hours, t] of every row, found in one merge-like pass."""
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    return np.searchsorted(timestamps, timestamps - np.timedelta64(hours, 'h'), side='right')
+
+def rolling_moments(values, starts):
+    """Rolling mean and sample standard deviation of every column, read off prefix sums.
+
+    `values` is (rows x series); row t's window is rows [starts[t], t]. Missing values are
+    skipped, and a window with fewer than two observations has no standard deviation.
+    Values are centered on their column mean first so the sums of squares do not cancel.
+    """
+    observed = ~np.isnan(values)
+    centered = np.where(observed, values - np.nanmean(values, axis=0), 0.0)
+    sums = np.zeros((3, len(values) + 1, values.shape[1]))
+    np.cumsum(observed, axis=0, out=sums[0, 1:])
+    np.cumsum(centered, axis=0, out=sums[1, 1:])
+    np.cumsum(centered ** 2, axis=0, out=sums[2, 1:])
+    counts, totals, squares = sums[:, 1:] - sums[:, starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = totals / counts
+        variance = (squares - totals * mean) / (counts - 1)
+    std = np.sqrt(np.maximum(variance, 0.0))
+    return mean + np.nanmean(values, axis=0), np.where(counts > 1, std, np.nan)
+
+def rolling_quantiles(series, starts, quantiles=QUANTILES):
+    """Rolling quantiles of one series in a single pass over a sorted window.
+
+    Each row inserts its value into the sorted window and evicts the rows that fell out.
+    Bisection finds each position in O(log w) comparisons, but every insert and delete
+    shifts up to w list entries, so a pass is O(n * w). The shifts are single memmoves;
+    for a year of hours at w up to 4000 this stays several times faster than an
+    O(log w) order-statistic tree in Python. Quantiles interpolate linearly, as
+    np.percentile does. Returns a (rows x quantiles) array.
+    """
+    result = np.full((len(series), len(quantiles)), np.nan)
+    window = []
+    evict_from = 0
+    for t, value in enumerate(series.tolist()):
+        for old in series[evict_from:starts[t]].tolist():
+            if old == old:  # NaN never entered the window
+                del window[bisect_left(window, old)]
+        evict_from = starts[t]
+        if value == value:
+            insort(window, value)
+        if window:
+            last = len(window) - 1
+            for k, quantile in enumerate(quantiles):
+                position = quantile * last
+                below = int(position)
+                above = min(below + 1, last)
+                result[t, k] = window[below] + (window[above] - window[below]) * (position - below)
+    return result
+
+def cheapest_counts(values):
+    """Running count of the hours each column had the lowest value (ties go to the first), with a leading zero row."""
+    observed = ~np.isnan(values)
+    cheapest = np.zeros(values.shape, dtype=np.int64)
+    has_value = observed.any(axis=1)
+    rows = np.flatnonzero(has_value)
+    cheapest[rows, np.argmin(np.where(observed, values, np.inf)[rows], axis=1)] = 1
+    counts = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(cheapest, axis=0, out=counts[1:])
+    return counts
+
+class RollingRateStats:
+    """Rolling means, volatilities and quantiles of every venue's hourly rate, built once per dataset.
+
+    `rates` is a frame of hourly rates (% per hour) indexed by time, one column per venue.
+    Every ROLLING_WINDOWS series is computed in one pass per venue when the object is built;
+    the dashboard then only slices them, and the cheapest-hour share of any row range is a
+    difference of running counts.
+    """
+
+    def __init__(self, rates):
+        self.index = rates.index
+        self.venues = list(rates.columns)
+        self.values = rates.to_numpy(dtype=float)
+        self.mean, self.std, self.quantiles = {}, {}, {}
+        for label, hours in ROLLING_WINDOWS.items():
+            starts = window_starts(rates.index, hours)
+            self.mean[label], self.std[label] = rolling_moments(self.values, starts)
+            self.quantiles[label] = np.stack(
+                [rolling_quantiles(self.values[:, v], starts) for v in range(len(self.venues))], axis=1)
+        self._cheapest = cheapest_counts(self.values)
+
+    def series(self, label, statistic, i, j):
+        """Rows [i, j) of the rolling 'Mean' or 'Volatility' of every venue, as a frame."""
+        values = self.mean[label] if statistic == 'Mean' else self.std[label]
+        return pd.DataFrame(values[i:j], index=self.index[i:j], columns=self.venues)
+
+    def quantile_series(self, label, venue, i, j):
+        """Rows [i, j) of one venue's rolling quantiles, one column per QUANTILES entry."""
+        values = self.quantiles[label][i:j, self.venues.index(venue)]
+        return pd.DataFrame(values, index=self.index[i:j], columns=[f"P{quantile * 100:.0f}" for quantile in QUANTILES])
+
+    def summary(self, i, j):
+        """Mean, volatility, quantiles and cheapest-hour share of every venue over rows [i, j)."""
+        values = self.values[i:j]
+        counts = self._cheapest[j] - self._cheapest[i]
+        summary = pd.DataFrame({
+            'Mean': np.nanmean(values, axis=0),
+            'Volatility': np.nanstd(values, axis=0, ddof=1),
+            **{f"P{quantile * 100:.0f}": np.nanpercentile(values, quantile * 100, axis=0) for quantile in QUANTILES},
+            'Cheapest Hours': counts / max(counts.sum(), 1),
+        }, index=self.venues)
+        summary.index.name = 'Venue'
+        return summary
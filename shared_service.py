@@ -0,0 +1,257 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pandas as pd
+import requests
+from dateutil.relativedelta import relativedelta
+
+from cache import cached_fees, frame_digest
+from fee_engine import (
+    ASGARD_BORROW_ASSETS, ASSETS, EXCHANGE_NAMES, LEVERAGE_OPTIONS, FeeSchedules, build_hourly_fees_df,
+    calculate_all_exchange_fees, compute_fee_grid, get_displayed_exchanges, required_columns, window_keys,
+)
+from fetcher import API_URL, fetch_chunks
+from history_store import HISTORY_DB_PATH, load_history
+from instrumentation import timed
+from live_tail import poll_new_rows
+from prefix_index import PrefixSumIndex
+
+REFRESH_SECONDS = 5 * 60
+IDLE_SECONDS = 60 * 60
+DEFAULT_ASGARD_FEE = 0.06 / 100
+DEFAULT_CAPITAL = 10000.0
+DEFAULT_LEVERAGE = LEVERAGE_OPTIONS[1]
+METADATA_URL = "https://perp-fee-comparison.0xdeepmehta.workers.dev/"
+METADATA_TIMEOUT = 30
+TAIL_POLL_SECONDS = 60
+# Rows kept by the shared live tail; sessions whose last row is older trigger a wider poll
+TAIL_KEEP_ROWS = 7 * 24
+
+# Everything a dashboard session needs for one date window, computed once for all sessions.
+# unit_fee_grid is the fee grid for $1 of capital at the default Asgard fees.
+WindowSnapshot = namedtuple('WindowSnapshot', ['df', 'digest', 'rate_index', 'schedules', 'unit_fee_grid', 'loaded_at'])
+
+def window_dates(time_value, time_unit, now=None):
+    """(start, end) datetimes of the dashboard window of `time_value` Hours, Days or Months ending now."""
+    end_date = now or datetime.now()
+    if time_unit == 'Months':
+        return end_date - relativedelta(months=time_value), end_date
+    return end_date - timedelta(**{time_unit.lower(): time_value}), end_date
+
+def window_key(start_date, end_date):
+    return ('window', start_date, end_date)
+
+def fetch_headless(ranges):
+    yield from fetch_chunks(API_URL, ranges, columns=required_columns(ASSETS, ASGARD_BORROW_ASSETS))
+
+def load_window(start_date, end_date, fetch_ranges=fetch_headless, previous=None, db_path=HISTORY_DB_PATH, metrics=None):
+    """Load a window through the history store and precompute its shared results.
+
+    Every fee schedule is compiled once over the window (`schedules`); the fee paths
+    select their keys from it instead of compiling the frame again. Returns `previous`
+    unchanged when the data has not changed since it was built.
+    """
+    df = load_history(start_date, end_date, fetch_ranges, required_columns(ASSETS, ASGARD_BORROW_ASSETS), db_path, metrics)
+    if df.empty:
+        return None
+    digest = frame_digest(df)
+    if previous is not None and previous.digest == digest:
+        return previous
+    with timed(metrics, 'Precompute shared results', rows=len(df)):
+        schedules = FeeSchedules(df, window_keys(ASSETS, ASGARD_BORROW_ASSETS))
+        unit_fee_grid = compute_fee_grid(schedules, 1.0, DEFAULT_ASGARD_FEE, DEFAULT_ASGARD_FEE,
+                                         ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges)
+        rate_index = PrefixSumIndex(df)
+    return WindowSnapshot(df, digest, rate_index, schedules, unit_fee_grid, time.time())
+
+def cached_venue_fees(window, asset, leverage, borrow_asset, asgard_open_fee, asgard_close_fee, initial_capital):
+    """calculate_all_exchange_fees of one configuration of a window, through the shared fee cache."""
+    key = ('exchange_fees', window.digest, asset, leverage, borrow_asset, asgard_open_fee, asgard_close_fee, initial_capital)
+    return cached_fees(key, lambda: calculate_all_exchange_fees(
+        window.schedules, get_displayed_exchanges(borrow_asset), asset, initial_capital * leverage, leverage, borrow_asset,
+        asgard_open_fee, asgard_close_fee))
+
+def cached_hourly_fees(window, asset, leverage, borrow_asset, asgard_open_fee, asgard_close_fee, initial_capital):
+    """build_hourly_fees_df of one configuration of a window, through the shared fee cache."""
+    key = ('hourly_fees', window.digest, asset, leverage, borrow_asset, asgard_open_fee, asgard_close_fee, initial_capital)
+    return cached_fees(key, lambda: build_hourly_fees_df(
+        window.schedules, get_displayed_exchanges(borrow_asset), EXCHANGE_NAMES, asset, initial_capital * leverage, leverage, borrow_asset))
+
+def load_metadata(url):
+    response = requests.get(url, timeout=METADATA_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+class AggregationService:
+    """Process-wide owner of upstream fetches and precomputed results.
+
+    Every Streamlit session reads from the same entries. Concurrent requests for an entry
+    that is not loaded yet wait for a single load instead of each hitting upstream, and a
+    background thread reloads entries that are still in use every `refresh_seconds`,
+    except the keys handed to `manage`, whose owner (the cache warmer) refreshes them on
+    its own schedule. Entries nobody has read for `idle_seconds` are dropped.
+    """
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS, idle_seconds=IDLE_SECONDS, db_path=HISTORY_DB_PATH):
+        self.refresh_seconds = refresh_seconds
+        self.idle_seconds = idle_seconds
+        self.db_path = db_path
+        self.counters = {'Requests': 0, 'Served': 0, 'Waited': 0, 'Loads': 0, 'Refreshes': 0, 'Evictions': 0, 'Tail polls': 0}
+        self._entries = {}
+        self._loaders = {}
+        self._last_access = {}
+        self._inflight = {}
+        self._managed = frozenset()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._tail = None
+        self._tail_since = None
+        self._tail_polled = None
+        self._tail_lock = threading.Lock()
+
+    def get(self, key, load, refresh_load=None):
+        """Return the entry for `key`, calling `load(previous)` once if it is missing.
+
+        `refresh_load(previous)` is what the background refresh uses later (default `load`);
+        it must not touch the calling session's UI.
+        """
+        with self._lock:
+            self.counters['Requests'] += 1  # Once per call, however many times a waiter loops below
+        while True:
+            with self._lock:
+                self._last_access[key] = time.monotonic()
+                if key in self._entries:
+                    self.counters['Served'] += 1
+                    return self._entries[key]
+                event = self._inflight.get(key)
+                owner = event is None
+                if owner:
+                    event = self._inflight[key] = threading.Event()
+                else:
+                    self.counters['Waited'] += 1
+            if owner:
+                break
+            event.wait()
+        value = None
+        try:
+            value = load(None)
+        finally:
+            with self._lock:
+                if value is not None:
+                    self._entries[key] = value
+                    self._loaders[key] = refresh_load or load
+                    self.counters['Loads'] += 1
+                del self._inflight[key]
+            event.set()
+        return value
+
+    def get_window(self, start_date, end_date, fetch_ranges=fetch_headless, metrics=None):
+        """Shared WindowSnapshot for a date window; `fetch_ranges` and `metrics` are only used if this call loads it."""
+        return self.get(
+            window_key(start_date, end_date),
+            lambda previous: load_window(start_date, end_date, fetch_ranges, previous, self.db_path, metrics),
+            lambda previous: load_window(start_date, end_date, fetch_headless, previous, self.db_path))
+
+    def get_metadata(self, url):
+        """Shared JSON payload of a metadata endpoint."""
+        return self.get(('metadata', url), lambda previous: load_metadata(url))
+
+    def poll_tail(self, after, max_age=TAIL_POLL_SECONDS):
+        """Snapshots newer than createdAt `after`, from one upstream poll shared by every live session.
+
+        Upstream is polled at most once every `max_age` seconds whichever session asks, and
+        concurrent callers wait for the poll in flight instead of making their own. A
+        caller whose `after` predates the rows kept here triggers a poll from `after`.
+        Returns a frame of createdAt plus every required column, possibly empty.
+        """
+        with self._tail_lock:
+            stale = self._tail_polled is None or time.monotonic() - self._tail_polled >= max_age
+            behind = self._tail is not None and after < self._tail_since
+            if stale or behind:
+                since = after if self._tail is None or behind else self._tail['createdAt'].iloc[-1]
+                rows = poll_new_rows(API_URL, since, required_columns(ASSETS, ASGARD_BORROW_ASSETS), self.db_path)
+                self._tail_polled = time.monotonic()
+                with self._lock:
+                    self.counters['Tail polls'] += 1
+                if rows is not None:
+                    if self._tail is None or since < self._tail_since:
+                        self._tail, self._tail_since = rows, since
+                    else:
+                        self._tail = pd.concat([self._tail, rows], ignore_index=True)
+                    if len(self._tail) > TAIL_KEEP_ROWS:
+                        self._tail_since = self._tail['createdAt'].iloc[-TAIL_KEEP_ROWS - 1]
+                        self._tail = self._tail.iloc[-TAIL_KEEP_ROWS:].reset_index(drop=True)
+            tail = self._tail
+        if tail is None:
+            return None
+        return tail[tail['createdAt'] > after].reset_index(drop=True)
+
+    def peek(self, key):
+        """The entry for `key` if it is loaded, without loading it or counting an access."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def evict(self, key):
+        """Drop the entry for `key`; the next get loads it again."""
+        with self._lock:
+            self._drop(key)
+
+    def manage(self, keys):
+        """Leave the entries of `keys` to their owner's refresh(keys) calls instead of the refresh loop."""
+        with self._lock:
+            self._managed = frozenset(keys)
+
+    def _drop(self, key):
+        if self._entries.pop(key, None) is not None:
+            self.counters['Evictions'] += 1
+        self._loaders.pop(key, None)
+        self._last_access.pop(key, None)
+
+    def refresh(self, keys=None):
+        """Reload every entry still in use that is not managed, or only those of `keys`, and drop idle ones."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, accessed in self._last_access.items() if now - accessed > self.idle_seconds]:
+                self._drop(key)
+            active = [(key, self._loaders[key], self._entries[key]) for key in self._loaders
+                      if (key not in self._managed if keys is None else key in keys)]
+        for key, load, previous in active:
+            try:
+                value = load(previous)
+            except Exception:
+                continue  # Keep serving the previous value; the next refresh retries
+            if value is not None:
+                with self._lock:
+                    if key in self._loaders:
+                        self._entries[key] = value
+                        self.counters['Refreshes'] += 1
+
+    def start(self):
+        """Start the background refresh thread once."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refresh_loop, name='aggregation-refresh', daemon=True)
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            self.refresh()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, Entries=len(self._entries))
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    """Return the process-wide AggregationService, starting its refresh thread on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AggregationService()
+            _service.start()
+        return _service
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from fee_engine import ASGARD_EXCHANGES, PERP_EXCHANGES, fee_rates, hourly_rate_matrix
+
+VENUES = PERP_EXCHANGES + ASGARD_EXCHANGES
+BACKTEST_COLUMNS = ['asset', 'leverage', 'borrow_asset', 'optimal_fees', 'switches',
+                    'best_single_venue', 'best_single_fees', 'savings']
+
+def optimal_schedule(hourly_fees, open_fees, close_fees):
+    """Minimum-cost venue schedule by dynamic programming over hours x venues.
+
+    `hourly_fees` is (hours x batch x venues) in USD, inf where a venue is not available;
+    `open_fees` and `close_fees` are (batch x venues). Holding venue v for hour t costs
+    hourly_fees[t, :, v] and moving from u to v pays close_fees[u] + open_fees[v]. Each
+    step is vectorized over the batch and venues. Returns the total cost per batch entry,
+    including the first open and the last close, and the venue held every hour (hours x batch).
+    """
+    n_hours, n_batch, n_venues = hourly_fees.shape
+    if not n_hours:
+        return np.zeros(n_batch), np.zeros((0, n_batch), dtype=np.int8)
+    rows = np.arange(n_batch)
+    stay = np.arange(n_venues)
+    came_from = np.empty((n_hours, n_batch, n_venues), dtype=np.int8)
+    came_from[0] = stay
+    cost = open_fees + hourly_fees[0]
+    for t in range(1, n_hours):
+        # Switching into v comes from the venue that is cheapest to leave; staying wins ties
+        exit_cost = cost + close_fees
+        best_exit = np.argmin(exit_cost, axis=1)
+        switch_cost = exit_cost[rows, best_exit][:, None] + open_fees
+        switching = switch_cost < cost
+        came_from[t] = np.where(switching, best_exit[:, None], stay)
+        cost = np.where(switching, switch_cost, cost) + hourly_fees[t]
+    final_cost = cost + close_fees
+    schedule = np.empty((n_hours, n_batch), dtype=np.int8)
+    schedule[-1] = np.argmin(final_cost, axis=1)
+    for t in range(n_hours - 1, 0, -1):
+        schedule[t - 1] = came_from[t, rows, schedule[t]]
+    return final_cost[rows, schedule[-1]], schedule
+
+def backtest_grid(df, initial_capital, asgard_open_fee, asgard_close_fee,
+                  assets, leverage_options, borrow_assets, exchanges_for):
+    """Optimal venue-switching schedule for every asset x leverage x borrow asset configuration.
+
+    Venues are those of exchanges_for(borrow_asset) with data; hourly variable fees are
+    position_size * rate / 100 as in calculate_exchange_fees, and every switch pays the
+    fee_rates close fee of the venue left and open fee of the venue entered. Returns a tidy
+    frame with the columns in BACKTEST_COLUMNS and the (hours x rows) schedule of VENUES
+    indices, one column per frame row. `df` may be a compiled FeeSchedules covering the keys.
+    """
+    configs = [(asset, borrow_asset) for borrow_asset in borrow_assets for asset in assets]
+    keys = [(exchange, asset, borrow_asset) for asset, borrow_asset in configs for exchange in VENUES]
+    leverage = np.asarray(leverage_options, dtype=float)
+    shape = (len(configs), len(VENUES))
+    rates, available = hourly_rate_matrix(df, keys, leverage)
+    offered = np.array([exchange in exchanges_for(borrow_asset) for exchange, _, borrow_asset in keys])
+    available = (available & offered).reshape(shape)
+
+    # Everything is laid out as (configs x leverages x venues) and flattened to a batch
+    position_size = initial_capital * leverage[None, :, None]
+    hourly_fees = rates.reshape((len(rates),) + shape + (len(leverage),)).transpose(0, 1, 3, 2) / 100 * position_size
+    hourly_fees = np.where(available[None, :, None, :], hourly_fees, np.inf)
+    fee_schedule = [fee_rates(exchange, asset, asgard_open_fee, asgard_close_fee) for exchange, asset, _ in keys]
+    open_fees = np.array([open_rate for open_rate, _, _ in fee_schedule]).reshape(shape)[:, None, :] * position_size
+    close_fees = np.array([close_rate for _, close_rate, _ in fee_schedule]).reshape(shape)[:, None, :] * position_size
+
+    n_batch = len(configs) * len(leverage)
+    hourly_fees = hourly_fees.reshape(len(rates), n_batch, len(VENUES))
+    open_fees = np.broadcast_to(open_fees, shape[:1] + (len(leverage),) + shape[1:]).reshape(n_batch, len(VENUES))
+    close_fees = np.broadcast_to(close_fees, shape[:1] + (len(leverage),) + shape[1:]).reshape(n_batch, len(VENUES))
+    optimal_fees, schedule = optimal_schedule(hourly_fees, open_fees, close_fees)
+
+    single_fees = open_fees + hourly_fees.sum(axis=0) + close_fees
+    best_single = np.argmin(single_fees, axis=1)
+    best_single_fees = single_fees[np.arange(n_batch), best_single]
+    has_venue = np.repeat(available.any(axis=1), len(leverage))
+    optimal_fees = np.where(has_venue, optimal_fees, np.nan)
+    best_single_fees = np.where(has_venue, best_single_fees, np.nan)
+
+    summary = pd.DataFrame({
+        'asset': np.repeat([asset for asset, _ in configs], len(leverage)),
+        'leverage': np.tile(leverage, len(configs)),
+        'borrow_asset': np.repeat([borrow_asset for _, borrow_asset in configs], len(leverage)),
+        'optimal_fees': optimal_fees,
+        'switches': (schedule[1:] != schedule[:-1]).sum(axis=0),
+        'best_single_venue': np.where(has_venue, np.array(VENUES)[best_single], None),
+        'best_single_fees': best_single_fees,
+        'savings': np.maximum(best_single_fees - optimal_fees, 0.0),  # Clip rounding noise
+    }, columns=BACKTEST_COLUMNS)
+    return summary, schedule
+
+def schedule_segments(schedule, timestamps):
+    """Collapse an hourly schedule of VENUES indices into (venue, start, end, hours) holding periods."""
+    if not len(schedule):
+        return pd.DataFrame(columns=['venue', 'start', 'end', 'hours'])
+    starts = np.flatnonzero(np.diff(schedule, prepend=-1))
+    ends = np.append(starts[1:], len(schedule)) - 1
+    timestamps = np.asarray(timestamps)
+    return pd.DataFrame({
+        'venue': np.array(VENUES)[schedule[starts]],
+        'start': timestamps[starts],
+        'end': timestamps[ends],
+        'hours': ends - starts + 1,
+    })
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from cache_warmer import CacheWarmer, snapshot_nbytes, window_hours
+from fee_engine import ASGARD_BORROW_ASSETS, ASSETS, FeeSchedules, window_keys
+from prefix_index import PrefixSumIndex
+from shared_service import AggregationService, WindowSnapshot, frame_digest
+from test_fee_engine import rate_frame
+
+WINDOWS = [(1, 'Days'), (7, 'Days'), (1, 'Months'), (3, 'Months')]
+NOW = datetime(2026, 3, 31, 12)
+
+class SyntheticService(AggregationService):
+    """An AggregationService whose windows are synthetic frames of the requested length."""
+
+    def __init__(self):
+        super().__init__()
+        self.loads = []
+
+    def get_window(self, start_date, end_date, fetch_ranges=None, metrics=None):
+        def load(previous):
+            self.loads.append((start_date, end_date))
+            df = rate_frame(hours=window_hours(start_date, end_date), missing=0.0)
+            return WindowSnapshot(df, frame_digest(df), PrefixSumIndex(df), FeeSchedules(df, window_keys(ASSETS, ASGARD_BORROW_ASSETS)),
+                                  df.iloc[:0], 0.0)
+        return self.get(('window', start_date, end_date), load)
+
+    def get_metadata(self, url):
+        return {}
+
+def window_bytes(service, warmer):
+    warmer.warm(NOW)
+    return [snapshot_nbytes(service.peek(key)) for key in sorted(warmer._warmed)]
+
+def test_windows_past_the_budget_are_not_loaded():
+    service = SyntheticService()
+    # A little headroom, as the size estimate rounds up the fixed overhead of the shorter windows
+    budget = int(sum(window_bytes(service, CacheWarmer(service, WINDOWS[:3], assets=[]))) * 1.01)
+    service = SyntheticService()
+    warmer = CacheWarmer(service, WINDOWS, assets=[], memory_budget=budget)
+    warmer.warm(NOW)
+    assert len(service.loads) == 3
+    assert warmer.stats()['Skipped (budget)'] == 1
+    assert warmer.stats()['Bytes'] <= budget
+
+def test_shrinking_the_budget_evicts_warmed_windows():
+    service = SyntheticService()
+    warmer = CacheWarmer(service, WINDOWS, assets=[])
+    warmer.warm(NOW)
+    assert service.stats()['Entries'] == 4
+    warmer.memory_budget = snapshot_nbytes(service.peek(sorted(warmer._warmed)[-1])) * 2
+    warmer.warm(NOW)
+    assert service.stats()['Entries'] == warmer.stats()['Windows'] < 4
+    assert warmer.stats()['Bytes'] <= warmer.memory_budget
+
+def test_refresh_loop_skips_warmed_windows():
+    service = SyntheticService()
+    warmer = CacheWarmer(service, WINDOWS[:2], assets=[])
+    warmer.warm(NOW)
+    service.get(('other',), lambda previous: 'value')
+    refreshed = []
+    service._loaders = {key: (lambda key: lambda previous: refreshed.append(key))(key) for key in service._loaders}
+    service.refresh()
+    assert refreshed == [('other',)]
+    service.refresh(sorted(warmer._warmed))
+    assert sorted(refreshed[1:]) == sorted(warmer._warmed)
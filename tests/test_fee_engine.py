@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fee_engine import (
+    ASGARD_BORROW_ASSETS, ASSETS, LEVERAGE_OPTIONS, FeeSchedules, build_hourly_fees_df, calculate_all_exchange_fees,
+    compute_fee_grid, get_displayed_exchanges, hourly_rate_matrix, required_columns, select_configuration, window_keys,
+)
+
+def rate_frame(hours=200, missing=0.05, seed=0):
+    """Synthetic hourly rates for every required column, with a share of values missing."""
+    rng = np.random.default_rng(seed)
+    columns = required_columns(ASSETS, ASGARD_BORROW_ASSETS)
+    values = rng.normal(0.001, 0.002, (hours, len(columns)))
+    values[rng.random(values.shape) < missing] = np.nan
+    frame = pd.DataFrame(values, columns=columns)
+    frame.insert(0, 'createdAt', pd.date_range('2026-01-01', periods=hours, freq='h').strftime('%Y-%m-%dT%H:%M:%S.000Z'))
+    return frame
+
+@pytest.mark.parametrize('borrow_asset', ASGARD_BORROW_ASSETS)
+def test_fee_grid_skips_the_same_missing_hours_as_per_venue_fees(borrow_asset):
+    df = rate_frame()
+    grid = compute_fee_grid(df, 1000.0, 0.0006, 0.0006, ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges)
+    exchanges = get_displayed_exchanges(borrow_asset)
+    for asset in ASSETS:
+        for leverage in LEVERAGE_OPTIONS:
+            fees = calculate_all_exchange_fees(df, exchanges, asset, 1000.0 * leverage, leverage, borrow_asset, 0.0006, 0.0006)
+            selected = select_configuration(grid, asset, leverage, borrow_asset)
+            for exchange in exchanges:
+                assert selected.at[exchange, 'variable_fees'] == pytest.approx(fees[exchange][1], abs=1e-9)
+                assert selected.at[exchange, 'total_fees'] == pytest.approx(fees[exchange][3], abs=1e-9)
+
+def test_one_missing_deposit_hour_drops_the_whole_hour():
+    df = rate_frame(hours=48, missing=0.0)
+    df.loc[5, 'marginfi.solToken.depositIRate'] = np.nan
+    fees = calculate_all_exchange_fees(df, ['marginfi'], 'SOL', 2000.0, 2.0, 'USDT', 0.0006, 0.0006)['marginfi']
+    grid = compute_fee_grid(df, 1000.0, 0.0006, 0.0006, ['SOL'], [2.0], ['USDT'], get_displayed_exchanges)
+    expected = np.nansum(fees[4].to_numpy()) / 100 * 2000.0
+    assert np.isnan(fees[4].iloc[5])
+    assert fees[1] == pytest.approx(expected)
+    assert select_configuration(grid, 'SOL', 2.0, 'USDT').at['marginfi', 'variable_fees'] == pytest.approx(expected)
+
+def test_selecting_from_compiled_schedules_matches_compiling_the_frame():
+    df = rate_frame(missing=0.05, seed=1)
+    schedules = FeeSchedules(df, window_keys(ASSETS, ASGARD_BORROW_ASSETS))
+    for compounding in [False, True]:
+        pd.testing.assert_frame_equal(
+            compute_fee_grid(schedules, 1000.0, 0.0006, 0.0006, ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges, compounding),
+            compute_fee_grid(df, 1000.0, 0.0006, 0.0006, ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS, get_displayed_exchanges, compounding))
+    exchanges = get_displayed_exchanges('USDC')
+    fees = calculate_all_exchange_fees(schedules, exchanges, 'ETH', 3000.0, 3.0, 'USDC', 0.0006, 0.0006)
+    for exchange, expected in calculate_all_exchange_fees(df, exchanges, 'ETH', 3000.0, 3.0, 'USDC', 0.0006, 0.0006).items():
+        assert fees[exchange][:4] == pytest.approx(expected[:4])
+        pd.testing.assert_series_equal(fees[exchange][4], expected[4])
+    names = {exchange: exchange for exchange in exchanges}
+    pd.testing.assert_frame_equal(build_hourly_fees_df(schedules, exchanges, names, 'SOL', 2000.0, 2.0, 'USDT'),
+                                  build_hourly_fees_df(df, exchanges, names, 'SOL', 2000.0, 2.0, 'USDT'))
+    keys = [(exchange, 'SOL', 'USDC') for exchange in exchanges]
+    rates, available = hourly_rate_matrix(schedules.select(rows=slice(50, 120)), keys, LEVERAGE_OPTIONS)
+    expected_rates, expected_available = hourly_rate_matrix(df.iloc[50:120], keys, LEVERAGE_OPTIONS)
+    assert np.array_equal(rates, expected_rates, equal_nan=True)
+    assert np.array_equal(available, expected_available)
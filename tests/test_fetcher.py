@@ -0,0 +1,197 @@
+"""Fetching against a local stand-in for the fee-comparison API that injects latency and failures."""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import fetcher
+from fetcher import fetch_chunk, fetch_range, split_ranges
+from history_store import load_history
+
+DATE_FORMAT = '%Y-%m-%d'
+
+class StandIn:
+    """Threaded stand-in API serving one row per hour of every requested day, `to` inclusive.
+
+    `plan[from_date]` lists what the next requests for that chunk get: 500/503 for an
+    error status, 'slow' to sleep past the client timeout before the headers, 'stall' to
+    sleep past it halfway through the body, 'truncate' to drop the connection halfway
+    through the body, 'malformed' for a body that is not valid JSON, 'ok' for rows; once
+    the list is empty requests succeed, unless `always_fail` holds the chunk's from date.
+    """
+
+    def __init__(self, latency=0.0, slow_seconds=0.5, duplicate_rows=False):
+        self.latency = latency
+        self.slow_seconds = slow_seconds
+        self.duplicate_rows = duplicate_rows
+        self.plan = {}
+        self.always_fail = set()
+        self.requests = []
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                start, end = query['from'][0], query['to'][0]
+                with stand_in._lock:
+                    stand_in.requests.append((start, end))
+                    steps = stand_in.plan.get(start)
+                    step = steps.pop(0) if steps else 'ok'
+                    if start in stand_in.always_fail:
+                        step = 500
+                time.sleep(stand_in.latency)
+                if step == 'slow':
+                    time.sleep(stand_in.slow_seconds)
+                if step in (500, 503):
+                    self.send_response(step)
+                    self.end_headers()
+                    return
+                body = json.dumps(stand_in.rows(start, end)).encode()
+                if step == 'malformed':
+                    body = body.replace(b'}, {', b'} {', 1)
+                half = len(body) // 2
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    if step in ('stall', 'truncate'):
+                        self.wfile.write(body[:half])
+                        self.wfile.flush()
+                        if step == 'stall':
+                            time.sleep(stand_in.slow_seconds)
+                        self.close_connection = True
+                        return
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client timed out first
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/fee-comparisons'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def rows(self, start, end):
+        hour = datetime.strptime(start, DATE_FORMAT)
+        last = datetime.strptime(end, DATE_FORMAT) + timedelta(days=1)
+        rows = []
+        while hour < last:
+            row = {'createdAt': hour.strftime('%Y-%m-%dT%H:%M:%S.000Z'), 'value': hour.hour}
+            rows.extend([row, dict(row)] if self.duplicate_rows else [row])
+            hour += timedelta(hours=1)
+        return rows
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.close()
+
+def days(rows):
+    return sorted({row['createdAt'][:10] for row in rows})
+
+def test_split_ranges_boundaries():
+    assert split_ranges([('2026-01-01', '2026-01-01')]) == [('2026-01-01', '2026-01-01')]
+    assert split_ranges([('2026-01-01', '2026-01-07')]) == [('2026-01-01', '2026-01-07')]
+    assert split_ranges([('2026-01-01', '2026-01-08')]) == [('2026-01-01', '2026-01-07'), ('2026-01-08', '2026-01-08')]
+    assert split_ranges([('2025-12-30', '2026-01-02')], chunk_days=3) == [('2025-12-30', '2026-01-01'), ('2026-01-02', '2026-01-02')]
+    assert split_ranges([('2026-01-01', '2026-01-02'), ('2026-01-10', '2026-01-10')], chunk_days=1) == [
+        ('2026-01-01', '2026-01-01'), ('2026-01-02', '2026-01-02'), ('2026-01-10', '2026-01-10')]
+    assert split_ranges([('2026-01-02', '2026-01-01')]) == []
+    assert split_ranges([]) == []
+
+def test_fetch_chunk_trims_the_extra_day(stand_in):
+    rows = fetch_chunk(stand_in.url, '2026-01-01', '2026-01-02', backoff=0)
+    assert stand_in.requests == [('2026-01-01', '2026-01-03')]
+    assert len(rows) == 48
+    assert days(rows) == ['2026-01-01', '2026-01-02']
+
+def test_fetch_chunk_retries_server_errors(stand_in):
+    stand_in.plan['2026-01-01'] = [500, 503, 500]
+    rows = fetch_chunk(stand_in.url, '2026-01-01', '2026-01-01', attempts=4, backoff=0)
+    assert len(rows) == 24
+    assert len(stand_in.requests) == 4
+
+def test_fetch_chunk_retries_timeouts(stand_in, monkeypatch):
+    monkeypatch.setattr(fetcher, 'REQUEST_TIMEOUT', 0.2)
+    stand_in.plan['2026-01-01'] = ['slow', 'slow']
+    rows = fetch_chunk(stand_in.url, '2026-01-01', '2026-01-01', attempts=3, backoff=0)
+    assert len(rows) == 24
+    assert len(stand_in.requests) == 3
+
+@pytest.mark.parametrize('step', ['truncate', 'stall', 'malformed'])
+def test_fetch_chunk_retries_broken_bodies(stand_in, monkeypatch, step):
+    monkeypatch.setattr(fetcher, 'REQUEST_TIMEOUT', 0.2)
+    stand_in.plan['2026-01-01'] = [step, step]
+    rows = fetch_chunk(stand_in.url, '2026-01-01', '2026-01-01', attempts=3, backoff=0)
+    assert len(rows) == 24
+    assert len(stand_in.requests) == 3
+
+def test_fetch_chunks_reports_broken_bodies_as_failed_chunks(stand_in, monkeypatch):
+    monkeypatch.setattr(fetcher, 'REQUEST_TIMEOUT', 0.2)
+    monkeypatch.setattr(fetcher, 'fetch_chunk', partial(fetch_chunk, attempts=3, backoff=0))
+    stand_in.plan['2026-01-01'] = ['truncate', 'stall', 'malformed']
+    chunks = list(fetcher.fetch_chunks(stand_in.url, [('2026-01-01', '2026-01-02')], chunk_days=1))
+    assert sorted((start, rows is None) for start, _, rows in chunks) == [('2026-01-01', True), ('2026-01-02', False)]
+
+def test_fetch_chunk_returns_none_when_attempts_run_out(stand_in, monkeypatch):
+    monkeypatch.setattr(fetcher, 'REQUEST_TIMEOUT', 0.2)
+    stand_in.plan['2026-01-01'] = [500, 'slow', 503]
+    assert fetch_chunk(stand_in.url, '2026-01-01', '2026-01-01', attempts=3, backoff=0) is None
+    assert len(stand_in.requests) == 3
+
+def test_fetch_range_orders_and_deduplicates_rows():
+    server = StandIn(latency=0.05, duplicate_rows=True)
+    try:
+        rows, failed = fetch_range(server.url, '2026-01-01', '2026-01-05', chunk_days=2, max_workers=4)
+    finally:
+        server.close()
+    created_at = [row['createdAt'] for row in rows]
+    assert failed == []
+    assert len(rows) == 5 * 24
+    assert created_at == sorted(set(created_at))
+    assert sorted(server.requests) == [('2026-01-01', '2026-01-03'), ('2026-01-03', '2026-01-05'), ('2026-01-05', '2026-01-06')]
+
+def test_fetch_range_reports_failed_chunks(stand_in, monkeypatch):
+    monkeypatch.setattr(fetcher, 'fetch_chunk', partial(fetch_chunk, backoff=0))
+    stand_in.always_fail.update({'2026-01-01', '2026-01-05'})
+    rows, failed = fetch_range(stand_in.url, '2026-01-01', '2026-01-06', chunk_days=2)
+    assert failed == [('2026-01-01', '2026-01-02'), ('2026-01-05', '2026-01-06')]
+    assert days(rows) == ['2026-01-03', '2026-01-04']
+
+def test_load_history_resumes_after_a_failed_chunk(stand_in, tmp_path, monkeypatch):
+    monkeypatch.setattr(fetcher, 'fetch_chunk', partial(fetch_chunk, attempts=2, backoff=0))
+    db_path = str(tmp_path / 'history.sqlite3')
+
+    def fetch_ranges(ranges):
+        yield from fetcher.fetch_chunks(stand_in.url, ranges, chunk_days=2)
+
+    stand_in.always_fail.add('2026-01-03')
+    frame = load_history('2026-01-01', '2026-01-06', fetch_ranges, ['value'], db_path)
+    assert sorted(set(frame['createdAt'].str[:10])) == ['2026-01-01', '2026-01-02', '2026-01-05', '2026-01-06']
+
+    # Only the failed chunk is fetched again, and the stored days are served locally
+    stand_in.always_fail.clear()
+    stand_in.requests.clear()
+    frame = load_history('2026-01-01', '2026-01-06', fetch_ranges, ['value'], db_path)
+    assert stand_in.requests == [('2026-01-03', '2026-01-05')]
+    assert len(frame) == 6 * 24
+    assert frame['createdAt'].is_monotonic_increasing
+    assert frame['value'].tolist() == list(range(24)) * 6
+
+    stand_in.requests.clear()
+    load_history('2026-01-01', '2026-01-06', fetch_ranges, ['value'], db_path)
+    assert stand_in.requests == []
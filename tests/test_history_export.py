@@ -0,0 +1,48 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from history_export import export_series, open_export
+
+def series(start, hours, value):
+    return pd.DataFrame({'createdAt': pd.date_range(start, periods=hours, freq='h', tz='UTC'), 'value': float(value)})
+
+def test_reexporting_in_another_format_replaces_the_partition(tmp_path):
+    root = str(tmp_path)
+    export_series(series('2026-01-01', 48, 1), root, 'rates', format='arrow')
+    export_series(series('2026-01-01', 48, 2), root, 'rates', format='parquet')
+    assert os.listdir(tmp_path / 'rates' / 'month=2026-01') == ['part.parquet']
+    assert open_export(root, 'rates').column('value').to_pylist() == [2.0] * 48
+
+def test_concurrent_exports_of_one_partition_do_not_collide(tmp_path):
+    root = str(tmp_path)
+    errors = []
+
+    def export(i):
+        try:
+            for _ in range(20):
+                export_series(series('2026-01-01', 24, i), root, 'rates')
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=export, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path / 'rates' / 'month=2026-01') == ['part.arrow']
+    assert len(open_export(root, 'rates')) == 24
+
+def test_months_with_different_columns_open_together(tmp_path):
+    root = str(tmp_path)
+    export_series(series('2026-01-31', 24, 1), root, 'rates')
+    export_series(series('2026-02-01', 24, 2).assign(extra=3.0), root, 'rates')
+    table = open_export(root, 'rates')
+    assert len(table) == 48
+    assert table.column('extra').null_count == 24
+    assert table.column('value').to_pylist() == [1.0] * 24 + [2.0] * 24
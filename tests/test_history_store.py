@@ -0,0 +1,63 @@
+import json
+import sqlite3
+from contextlib import closing
+from datetime import timedelta
+
+import pytest
+
+import history_store
+from history_store import _connect, load_history, missing_ranges, save_snapshots
+
+def hourly_rows(day):
+    return [{'createdAt': f'{day}T{hour:02d}:00:00.000Z', 'value': hour} for hour in range(24)]
+
+def test_empty_days_are_retried_after_the_ttl(tmp_path, monkeypatch):
+    with closing(_connect(str(tmp_path / 'history.sqlite3'))) as conn:
+        save_snapshots(conn, hourly_rows('2026-01-01') + hourly_rows('2026-01-03'), '2026-01-01', '2026-01-04')
+        assert missing_ranges(conn, '2026-01-01', '2026-01-04') == []
+
+        monkeypatch.setattr(history_store, 'EMPTY_DAY_RETRY', timedelta(seconds=-1))
+        save_snapshots(conn, hourly_rows('2026-01-01') + hourly_rows('2026-01-03'), '2026-01-01', '2026-01-04')
+        assert missing_ranges(conn, '2026-01-01', '2026-01-04') == [('2026-01-02', '2026-01-02'), ('2026-01-04', '2026-01-04')]
+
+        # A backfilled day is complete once it has snapshots
+        save_snapshots(conn, hourly_rows('2026-01-02'), '2026-01-02', '2026-01-02')
+        assert missing_ranges(conn, '2026-01-01', '2026-01-04') == [('2026-01-04', '2026-01-04')]
+
+def test_stores_from_before_the_retry_column_retry_their_empty_days(tmp_path):
+    db_path = str(tmp_path / 'history.sqlite3')
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute('CREATE TABLE snapshots (created_at TEXT PRIMARY KEY, payload TEXT NOT NULL)')
+        conn.execute('CREATE TABLE fetched_days (day TEXT PRIMARY KEY)')
+        conn.execute("INSERT INTO snapshots VALUES ('2026-01-01T05:00:00.000Z', '{}')")
+        conn.executemany('INSERT INTO fetched_days VALUES (?)', [('2026-01-01',), ('2026-01-02',)])
+    with closing(_connect(db_path)) as conn:
+        assert missing_ranges(conn, '2026-01-01', '2026-01-02') == [('2026-01-02', '2026-01-02')]
+
+def test_days_stored_for_fewer_columns_are_fetched_again(tmp_path):
+    db_path = str(tmp_path / 'history.sqlite3')
+    fetched = []
+
+    def fetch_ranges(ranges):
+        for range_start, range_end in ranges:
+            fetched.append((range_start, range_end))
+            rows = [dict(row, other=1.0) for day in ('2026-01-01', '2026-01-02') for row in hourly_rows(day)]
+            yield range_start, range_end, rows
+
+    load_history('2026-01-01', '2026-01-02', fetch_ranges, ['value'], db_path)
+    load_history('2026-01-01', '2026-01-02', fetch_ranges, ['value'], db_path)
+    assert fetched == [('2026-01-01', '2026-01-02')]
+    frame = load_history('2026-01-01', '2026-01-02', fetch_ranges, ['value', 'other'], db_path)
+    assert fetched == [('2026-01-01', '2026-01-02')] * 2
+    assert list(frame.columns) == ['createdAt', 'value', 'other']
+
+def test_stores_of_full_payloads_are_not_fetched_again(tmp_path):
+    db_path = str(tmp_path / 'history.sqlite3')
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute('CREATE TABLE snapshots (created_at TEXT PRIMARY KEY, payload TEXT NOT NULL)')
+        conn.execute('CREATE TABLE fetched_days (day TEXT PRIMARY KEY, retry_after TEXT)')
+        conn.executemany('INSERT INTO snapshots VALUES (?, ?)',
+                         [(row['createdAt'], json.dumps(row)) for row in hourly_rows('2026-01-01')])
+        conn.execute("INSERT INTO fetched_days VALUES ('2026-01-01', NULL)")
+    frame = load_history('2026-01-01', '2026-01-01', lambda ranges: pytest.fail(f"fetched {ranges}"), ['value'], db_path)
+    assert frame['value'].tolist() == list(range(24))
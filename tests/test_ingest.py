@@ -0,0 +1,58 @@
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from history_store import _connect, read_frame, save_snapshots
+from ingest import column_paths, project_snapshot, snapshots_to_frame
+
+COLUMNS = ['drift.SOLPerp.driftHourlyFunding', 'marginfi.solToken.depositIRate', 'marginfi.usdcToken.borrowIRate',
+           'jupPerp.ethToken.HourlyBorrowRate', 'kamino.bonkToken.depositIRate']
+
+def nested_rows(hours=96, seed=0):
+    """Snapshots shaped like the API's, with venues, tokens and fields randomly missing or null."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for hour in range(hours):
+        row = {'createdAt': (pd.Timestamp('2026-01-01') + pd.Timedelta(hours=hour)).strftime('%Y-%m-%dT%H:%M:%S.000Z')}
+        if rng.random() > 0.2:
+            row['drift'] = {'SOLPerp': {'driftHourlyFunding': float(rng.normal()), 'markPrice': 100.0}}
+        if rng.random() > 0.2:
+            row['marginfi'] = {'solToken': {'depositIRate': float(rng.normal())} if rng.random() > 0.3 else {},
+                               'usdcToken': {'borrowIRate': None if rng.random() < 0.2 else float(rng.normal())}}
+        if rng.random() > 0.5:
+            row['jupPerp'] = {'ethToken': {'HourlyBorrowRate': int(rng.integers(0, 5)), 'utilization': 0.5}}
+        rows.append(row)
+    return rows
+
+def normalized(rows, columns):
+    df = pd.json_normalize(rows)
+    present = [column for column in columns if column in df and df[column].notna().any()]
+    return df[['createdAt'] + present].astype({column: float for column in present})
+
+def test_snapshots_to_frame_matches_json_normalize():
+    rows = nested_rows()
+    pd.testing.assert_frame_equal(snapshots_to_frame(rows, COLUMNS), normalized(rows, COLUMNS))
+
+def test_read_frame_of_projected_rows_matches_json_normalize(tmp_path):
+    rows = nested_rows()
+    paths = column_paths(COLUMNS)
+    with closing(_connect(str(tmp_path / 'history.sqlite3'))) as conn:
+        save_snapshots(conn, [project_snapshot(row, paths) for row in rows], '2026-01-01', '2026-01-04')
+        frame = read_frame(conn, '2026-01-01', '2026-01-04', COLUMNS)
+    pd.testing.assert_frame_equal(frame, normalized(rows, COLUMNS))
+
+def test_projection_keeps_only_the_referenced_fields():
+    row = nested_rows(1, seed=3)[0] | {'drift': {'SOLPerp': {'driftHourlyFunding': 0.5, 'markPrice': 100.0}}}
+    projected = project_snapshot(row, column_paths(COLUMNS))
+    assert projected['drift'] == {'SOLPerp': {'driftHourlyFunding': 0.5}}
+    assert 'kamino' not in projected
+    assert project_snapshot({'createdAt': 'x', 'drift': {'SOLPerp': None}}, column_paths(COLUMNS)) == {'createdAt': 'x'}
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_columns_missing_from_every_row_are_left_out(seed):
+    rows = [{key: value for key, value in row.items() if key != 'drift'} for row in nested_rows(seed=seed)]
+    frame = snapshots_to_frame(rows, COLUMNS)
+    assert 'drift.SOLPerp.driftHourlyFunding' not in frame
+    pd.testing.assert_frame_equal(frame, normalized(rows, COLUMNS))
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from fee_engine import (
+    ASGARD_BORROW_ASSETS, ASSETS, LEVERAGE_OPTIONS, FeeSchedules, compute_fee_grid, get_displayed_exchanges, select_configuration,
+    window_keys,
+)
+from multi_asset import compare_assets
+from prefix_index import PrefixSumIndex
+from shared_service import WindowSnapshot, frame_digest
+from test_fee_engine import rate_frame
+
+@pytest.mark.parametrize('compounding', [False, True])
+def test_comparison_matches_the_fee_grid(compounding):
+    df = rate_frame(missing=0.05, seed=3)
+    window = WindowSnapshot(df, frame_digest(df), PrefixSumIndex(df), FeeSchedules(df, window_keys(ASSETS, ASGARD_BORROW_ASSETS)), None, 0.0)
+    grid = compute_fee_grid(df, 1000.0, 0.0006, 0.0006, ASSETS, LEVERAGE_OPTIONS, ASGARD_BORROW_ASSETS,
+                            get_displayed_exchanges, compounding)
+    table, cumulative = compare_assets(window, ASSETS, ASGARD_BORROW_ASSETS, 3.0, 0.0006, 0.0006, 1000.0, compounding)
+    for row in table.itertuples():
+        selected = select_configuration(grid, row.asset, 3.0, row.borrow_asset)
+        assert row.variable_fee == pytest.approx(selected.at[row.exchange, 'variable_fees'], abs=1e-9)
+        assert row.total_fee == pytest.approx(selected.at[row.exchange, 'total_fees'], abs=1e-9)
+    assert np.allclose(cumulative.iloc[-1].to_numpy(), table['variable_fee'].to_numpy())
@@ -0,0 +1,21 @@
+import numpy as np
+
+from fee_engine import ASGARD_BORROW_ASSETS, ASSETS, LEVERAGE_OPTIONS, calculate_all_exchange_fees, get_displayed_exchanges
+from prefix_index import PrefixSumIndex, rate_terms
+from test_fee_engine import rate_frame
+
+def test_window_queries_match_the_per_venue_rate_series():
+    df = rate_frame(hours=300, missing=0.05)
+    index = PrefixSumIndex(df)
+    i, j = 40, 260
+    for borrow_asset in ASGARD_BORROW_ASSETS:
+        exchanges = get_displayed_exchanges(borrow_asset)
+        for asset in ASSETS:
+            for leverage in LEVERAGE_OPTIONS:
+                fees = calculate_all_exchange_fees(df, exchanges, asset, leverage, leverage, borrow_asset, 0.0, 0.0)
+                for exchange in exchanges:
+                    rates = fees[exchange][4].to_numpy(dtype=float)[i:j]
+                    terms = rate_terms(exchange, asset, leverage, borrow_asset)
+                    assert np.isclose(index.window_sum(terms, i, j), np.nansum(rates))
+                    assert np.isclose(index.window_mean(terms, i, j), np.nanmean(rates))
+                    assert np.allclose(index.cumulative(terms, i, j), np.nancumsum(rates))
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from fee_engine import calculate_hourly_variable_fees
+from report import report_rows
+from test_fee_engine import rate_frame
+
+def test_hourly_statistics_match_each_configuration():
+    df = rate_frame(missing=0.05, seed=2)
+    rows = report_rows(df, datetime(2026, 1, 9, 8), '7d', 'SOL', 1000.0, 0.0006, 0.0006)
+    assert rows['hours'].iloc[0] == 7 * 24
+    window = df.iloc[-7 * 24:]
+    for row in rows.itertuples():
+        hourly_fees = np.asarray(calculate_hourly_variable_fees(
+            window, row.exchange, 'SOL', 1000.0 * row.leverage, row.leverage, row.borrow_asset), dtype=float)
+        observed = hourly_fees[~np.isnan(hourly_fees)]
+        assert row.mean_hourly_fee == pytest.approx(observed.mean(), abs=1e-12)
+        assert row.std_hourly_fee == pytest.approx(observed.std(), abs=1e-12)
+        assert row.max_hourly_fee == pytest.approx(observed.max(), abs=1e-12)
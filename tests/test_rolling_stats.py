@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from rolling_stats import QUANTILES, rolling_quantiles, window_starts
+
+def test_rolling_quantiles_match_pandas():
+    rng = np.random.default_rng(4)
+    index = pd.date_range('2026-01-01', periods=500, freq='h').delete([30, 31, 200])
+    values = rng.normal(size=len(index))
+    values[rng.random(len(index)) < 0.1] = np.nan
+    series = pd.Series(values, index=index)
+    result = rolling_quantiles(values, window_starts(index, 24))
+    for k, quantile in enumerate(QUANTILES):
+        expected = series.rolling('24h', min_periods=1).quantile(quantile).to_numpy()
+        assert np.allclose(result[:, k], expected, equal_nan=True)
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pandas as pd
+
+import shared_service
+from shared_service import AggregationService
+
+def tail_rows(*hours):
+    return pd.DataFrame({'createdAt': [f'2026-01-01T{hour:02d}:00:00.000Z' for hour in hours], 'value': list(hours)})
+
+def test_waiters_count_as_one_request():
+    service = AggregationService()
+    started, release = threading.Event(), threading.Event()
+
+    def load(previous):
+        started.set()
+        release.wait()
+        return 'window'
+
+    owner = threading.Thread(target=service.get, args=('key', load))
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=service.get, args=('key', load))
+    waiter.start()
+    while service.stats()['Waited'] == 0:
+        time.sleep(0.01)
+    release.set()
+    owner.join()
+    waiter.join()
+    assert service.get('key', load) == 'window'
+    stats = service.stats()
+    assert (stats['Requests'], stats['Loads'], stats['Waited'], stats['Served']) == (3, 1, 1, 2)
+
+def test_poll_tail_survives_a_failed_first_poll(tmp_path, monkeypatch):
+    polls = []
+
+    def poll_new_rows(url, since, columns, db_path):
+        polls.append(since)
+        return None if len(polls) == 1 else tail_rows(1, 2)
+
+    monkeypatch.setattr(shared_service, 'poll_new_rows', poll_new_rows)
+    service = AggregationService(db_path=str(tmp_path / 'history.sqlite3'))
+    after = '2026-01-01T00:00:00.000Z'
+    assert service.poll_tail(after) is None
+    assert service.poll_tail(after) is None  # Within max_age of the failed poll
+    assert len(polls) == 1
+    assert service.poll_tail(after, max_age=0)['value'].tolist() == [1, 2]
+    assert service.poll_tail('2026-01-01T01:00:00.000Z')['value'].tolist() == [2]
+    assert polls == [after, after]